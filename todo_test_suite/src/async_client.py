@@ -0,0 +1,309 @@
+import asyncio
+import time
+import json as jsonlib
+from urllib.parse import urlsplit
+from requests.structures import CaseInsensitiveDict
+from src.commands import get_decoder, url
+
+#Minimal response object with the parts of requests.Response the tests use
+class AsyncResponse:
+    def __init__(self, status_code, reason, headers, content):
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return get_decoder()(self.content)
+
+#One keep-alive HTTP/1.1 connection over asyncio streams
+class HTTPConnection:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+        self.reusable = True
+        self.requests_sent = 0
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def write_request(self, method, path, headers=None, body=b""):
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        if body or method in ("POST", "PUT"):
+            lines.append(f"Content-Length: {len(body)}")
+        head = "\r\n".join(lines) + "\r\n\r\n"
+        self.writer.write(head.encode("latin-1") + body)
+        self.requests_sent += 1
+
+    async def read_response(self, method):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Server closed the connection without a response")
+        version, status, *reason = status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+
+        headers = CaseInsensitiveDict()
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip()] = value.strip()
+
+        status = int(status)
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            body = b""
+        elif headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = await self._read_chunked()
+        elif "Content-Length" in headers:
+            body = await self.reader.readexactly(int(headers["Content-Length"]))
+        else:
+            body = await self.reader.read()
+            self.reusable = False
+
+        if headers.get("Connection", "").lower() == "close" or version == "HTTP/1.0":
+            self.reusable = False
+        return AsyncResponse(status, reason[0] if reason else "", headers, body)
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size_line = await self.reader.readline()
+            size = int(size_line.split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                #Skip optional trailers up to the terminating blank line
+                while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readline()
+
+    def close(self):
+        self.reusable = False
+        if self.writer is not None:
+            self.writer.close()
+
+#Safe to resend when the connection drops before the response arrives
+idempotent_methods = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+#asyncio counterpart of TodoClient, at most `limit` requests are in flight at once
+class AsyncTodoClient:
+    def __init__(self, base_url=url, limit=10, timeout=None, observers=None, tracker=None):
+        parts = urlsplit(base_url)
+        self.base_url = base_url.rstrip("/")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.limit = limit
+        self.timeout = timeout
+        self.requests_sent = 0
+        self.connections_opened = 0
+        self._idle = []
+        self._semaphore = None
+        #Same timing records as TodoClient observers, without the DNS/TTFB split
+        self.observers = list(observers or [])
+        #StateTracker shared with a TodoClient, so todos created here are cleaned up too
+        self.tracker = tracker
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _acquire(self):
+        if self._idle:
+            return self._idle.pop(), True
+        connection = HTTPConnection(self.host, self.port)
+        await connection.open()
+        self.connections_opened += 1
+        return connection, False
+
+    def _release(self, connection):
+        if connection.reusable:
+            self._idle.append(connection)
+        else:
+            connection.close()
+
+    def _encode(self, json=None, data=None, headers=None):
+        headers = dict(headers or {})
+        body = b""
+        if json is not None:
+            body = jsonlib.dumps(json).encode("utf-8")
+            headers.setdefault("Content-Type", "application/json")
+        elif data is not None:
+            body = data.encode("utf-8") if isinstance(data, str) else data
+        return headers, body
+
+    def _observe(self, method, path, response, start, connected):
+        if self.tracker is not None:
+            self.tracker.observe(method, path, response.status_code, response.content,
+                                 response.headers.get("Content-Type", ""))
+        for observer in self.observers:
+            observer({
+                "method": method, "path": path, "status": response.status_code,
+                "bytes": len(response.content), "dns_estimate": 0.0, "connect": connected - start,
+                "ttfb": 0.0, "total": time.perf_counter() - start,
+            })
+
+    async def request(self, method, path, json=None, data=None, headers=None):
+        headers, body = self._encode(json, data, headers)
+
+        #Semaphore is created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+
+        async with self._semaphore:
+            start = time.perf_counter()
+            connection, reused = await self._acquire()
+            connected = time.perf_counter()
+            try:
+                try:
+                    response = await self._send(connection, method, path, headers, body)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    connection.close()
+                    #An idle keep-alive socket may have been closed by the server, retry once.
+                    #Not a POST though, the server may already have applied it.
+                    if not reused or method not in idempotent_methods:
+                        raise
+                    connection, reused = await self._acquire()
+                    response = await self._send(connection, method, path, headers, body)
+            except BaseException:
+                connection.close()
+                #The write may or may not have landed
+                if self.tracker is not None:
+                    self.tracker.observe(method, path, None)
+                raise
+            self._release(connection)
+
+        self._observe(method, path, response, start, connected)
+        return response
+
+    #HTTP/1.1 pipelining: requests are spread over up to `limit` connections and
+    #each connection keeps up to `depth` of them on the wire before the first
+    #response comes back, so throughput isn't bound by the round-trip time.
+    #`requests` holds (method, path, kwargs) tuples, responses come back in the same order.
+    #A connection dropped mid-batch raises rather than resending POSTs that may
+    #already have been applied.
+    async def pipeline(self, requests, depth=64):
+        responses = [None] * len(requests)
+        if not requests:
+            return responses
+        size = -(-len(requests) // min(self.limit, len(requests)))
+        indexed = list(enumerate(requests))
+        batches = [indexed[start:start + size] for start in range(0, len(indexed), size)]
+        await asyncio.gather(*(self._pipeline_batch(batch, depth, responses) for batch in batches))
+        return responses
+
+    async def _pipeline_batch(self, batch, depth, responses):
+        connection, _ = await self._acquire()
+        window = asyncio.Semaphore(depth)
+        in_flight = asyncio.Queue()
+
+        async def write():
+            try:
+                for index, (method, path, kwargs) in batch:
+                    headers, body = self._encode(**kwargs)
+                    await window.acquire()
+                    connection.write_request(method, path, headers, body)
+                    self.requests_sent += 1
+                    in_flight.put_nowait((index, method, path, time.perf_counter()))
+                    await connection.writer.drain()
+            except Exception as error:
+                #Wake the reader up rather than leaving it waiting for a response
+                in_flight.put_nowait(error)
+                raise
+
+        writer = asyncio.ensure_future(write())
+        try:
+            for answered in range(1, len(batch) + 1):
+                sent = await in_flight.get()
+                if isinstance(sent, Exception):
+                    raise sent
+                index, method, path, start = sent
+                response = await asyncio.wait_for(connection.read_response(method), self.timeout)
+                window.release()
+                responses[index] = response
+                self._observe(method, path, response, start, start)
+                if not connection.reusable and answered < len(batch):
+                    raise ConnectionResetError(
+                        f"Server closed the connection with {len(batch) - answered} pipelined requests unanswered")
+            await writer
+        except BaseException:
+            connection.close()
+            if self.tracker is not None:
+                self.tracker.invalidate()
+            raise
+        finally:
+            writer.cancel()
+        self._release(connection)
+
+    async def _send(self, connection, method, path, headers, body):
+        connection.write_request(method, path, headers, body)
+        self.requests_sent += 1
+        await connection.writer.drain()
+        return await asyncio.wait_for(connection.read_response(method), self.timeout)
+
+    async def list_todos(self, **kwargs):
+        return await self.request("GET", "/todos", **kwargs)
+
+    async def get_todo(self, todo_id, **kwargs):
+        return await self.request("GET", f"/todos/{todo_id}", **kwargs)
+
+    async def create_todo(self, todo=None, **kwargs):
+        return await self.request("POST", "/todos", json=todo, **kwargs)
+
+    async def amend_todo(self, todo_id, todo=None, **kwargs):
+        return await self.request("POST", f"/todos/{todo_id}", json=todo, **kwargs)
+
+    async def replace_todo(self, todo_id, todo=None, **kwargs):
+        return await self.request("PUT", f"/todos/{todo_id}", json=todo, **kwargs)
+
+    async def delete_todo(self, todo_id, **kwargs):
+        return await self.request("DELETE", f"/todos/{todo_id}", **kwargs)
+
+    async def head_todos(self, todo_id=None, **kwargs):
+        path = "/todos" if todo_id is None else f"/todos/{todo_id}"
+        return await self.request("HEAD", path, **kwargs)
+
+    async def options_todos(self, todo_id=None, **kwargs):
+        path = "/todos" if todo_id is None else f"/todos/{todo_id}"
+        return await self.request("OPTIONS", path, **kwargs)
+
+    async def docs(self, **kwargs):
+        return await self.request("GET", "/docs", **kwargs)
+
+    async def shutdown(self, **kwargs):
+        return await self.request("GET", "/shutdown", **kwargs)
+
+    def connection_stats(self):
+        return {
+            "requests": self.requests_sent,
+            "opened": self.connections_opened,
+            "reused": max(self.requests_sent - self.connections_opened, 0),
+        }
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+#POST every todo concurrently, responses are returned in the same order
+async def seed_todos(client, todos, **kwargs):
+    return await asyncio.gather(*(client.create_todo(todo, **kwargs) for todo in todos))
+
+#POST every todo with HTTP/1.1 pipelining, responses are returned in the same order
+async def pipeline_seed_todos(client, todos, depth=64, **kwargs):
+    return await client.pipeline([("POST", "/todos", dict(kwargs, json=todo)) for todo in todos], depth)
+
+#Run one of the helpers above from synchronous code with a fresh client
+def run(helper, *args, base_url=url, limit=10, observers=None, tracker=None, **kwargs):
+    async def main():
+        async with AsyncTodoClient(base_url, limit=limit, observers=observers, tracker=tracker) as client:
+            return await helper(client, *args, **kwargs)
+    return asyncio.run(main())
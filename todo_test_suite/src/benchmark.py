@@ -0,0 +1,989 @@
+import argparse
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.commands import (StateSnapshot, TodoClient, decode_todos, delete_all_todos, json_decoders,
+                          pipelined_create_todos, restore_state, url)
+from src.fake_server import start_fake_server
+from src.fuzz import generate_cases, generators
+from src.histogram import LatencyHistogram, percentile
+from src.resources import ResourceSampler, find_listening_pid
+from src import async_client
+
+#Benchmarks for the todo manager, e.g.
+#   python -m src.benchmark load --concurrency 8 --requests 5000 --out load.json
+#Pass --fake to run against the in-process stand-in instead of a live server.
+
+xml_headers = {"Accept": "application/xml", "Content-Type": "application/xml"}
+
+#What the benchmark is doing right now, tags the --sample-server samples
+current_phase = {"phase": None}
+
+def set_phase(name):
+    current_phase["phase"] = name
+
+#Every operation the load benchmark can issue, and its default weight in the mix
+operations = {
+    "list": ("GET", "/todos"),
+    "head": ("HEAD", "/todos"),
+    "create": ("POST", "/todos"),
+    "get": ("GET", "/todos/{id}"),
+    "amend": ("POST", "/todos/{id}"),
+    "replace": ("PUT", "/todos/{id}"),
+    "delete": ("DELETE", "/todos/{id}"),
+}
+default_mix = "list=2,head=1,create=2,get=4,amend=1,replace=1,delete=1"
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in operations:
+            raise argparse.ArgumentTypeError(f"Unknown operation in mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def todo_payload(rng, content_type):
+    title = f"bench {rng.randrange(1 << 30)}"
+    done = rng.random() < 0.5
+    if content_type == "xml":
+        return {"data": f"<todo><title>{title}</title><doneStatus>{str(done).lower()}</doneStatus>"
+                        f"<description>load test</description></todo>", "headers": xml_headers}
+    return {"json": {"title": title, "doneStatus": done, "description": "load test"}}
+
+def latency_summary(latencies, errors, wall_time):
+    ordered = sorted(latencies)
+    count = len(ordered)
+    return {
+        "count": count,
+        "errors": errors,
+        "rps": count / wall_time if wall_time else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "max_ms": (ordered[-1] if ordered else 0.0) * 1000,
+    }
+
+#Ids currently on the server, shared by the worker threads. An id is checked
+#out for as long as a request on it is in flight, so a concurrent delete can't
+#pull it out from under a GET and have the resulting 404 counted as an error.
+class IdPool:
+    def __init__(self, ids):
+        self.ids = list(ids)
+        self.lock = threading.Lock()
+
+    def checkout(self, rng):
+        with self.lock:
+            if not self.ids:
+                return None
+            index = rng.randrange(len(self.ids))
+            self.ids[index], self.ids[-1] = self.ids[-1], self.ids[index]
+            return self.ids.pop()
+
+    def add(self, todo_id):
+        with self.lock:
+            self.ids.append(todo_id)
+
+def seed_dataset(client, size, workers):
+    rng = random.Random(0)
+    payloads = [todo_payload(rng, "json")["json"] for _ in range(size)]
+    return [todo_id for todo_id in pipelined_create_todos(payloads, client, workers) if todo_id]
+
+#Pick the path and payload of one operation, returns (key, method, path, kwargs, todo_id)
+#or None if there was no id to act on. The id stays checked out until send_operation.
+def prepare_operation(ids, rng, name, content_type):
+    method, path = operations[name]
+    kwargs = {"headers": xml_headers} if content_type == "xml" else {}
+    if name in ("create", "amend", "replace"):
+        kwargs = todo_payload(rng, content_type)
+
+    todo_id = None
+    if "{id}" in path:
+        todo_id = ids.checkout(rng)
+        if todo_id is None:
+            return None
+        path = path.format(id=todo_id)
+    return f"{method} {operations[name][1]} [{content_type}]", method, path, kwargs, todo_id
+
+#Send a prepared operation and check its id back in, returns whether it succeeded
+def send_operation(client, ids, name, content_type, method, path, kwargs, todo_id=None):
+    try:
+        response = client.request(method, path, **kwargs)
+        ok = response.status_code < 400
+    except Exception:
+        response, ok = None, False
+    if name == "create" and ok:
+        created = response.json()["id"] if content_type == "json" else _xml_id(response.content)
+        ids.add(created)
+    if todo_id is not None and not (name == "delete" and ok):
+        ids.add(todo_id)
+    return ok
+
+#Issue one operation, returns (key, latency, ok) or None if there was no id to act on
+def run_operation(client, ids, rng, name, content_type):
+    prepared = prepare_operation(ids, rng, name, content_type)
+    if prepared is None:
+        return None
+    key, method, path, kwargs, todo_id = prepared
+    start = time.perf_counter()
+    ok = send_operation(client, ids, name, content_type, method, path, kwargs, todo_id)
+    return key, time.perf_counter() - start, ok
+
+def _xml_id(content):
+    return ET.fromstring(content).findtext("id")
+
+#Split `total` into `parts` near-equal shares
+def shares(total, parts):
+    return [total // parts + (1 if i < total % parts else 0) for i in range(parts)]
+
+#One interpreter tops out on the GIL long before the server does, so the drivers
+#can fan out over worker processes. Each one is pinned to a core of its own and
+#gets its own TodoClient, and so its own connection pool.
+def pin_to_core(index):
+    if hasattr(os, "sched_setaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+        os.sched_setaffinity(0, {cores[index % len(cores)]})
+
+def _process_main(base_url, index, pool_size, worker, args):
+    pin_to_core(index)
+    client = TodoClient(base_url, pool_size=pool_size, track_state=False)
+    try:
+        return worker(client, *args)
+    finally:
+        client.close()
+
+#Run worker(client, *args_for(index)) in `processes` worker processes, returns their results in order
+def fan_out(client, processes, pool_size, worker, args_for):
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(_process_main, client.base_url, index, pool_size, worker, args_for(index))
+                   for index in range(processes)]
+        results = [future.result() for future in futures]
+    #The workers wrote behind this client's back
+    if client.tracker is not None:
+        client.tracker.invalidate()
+    return results
+
+def process_count(processes):
+    return processes or os.cpu_count() or 1
+
+#Closed-loop share of the load benchmark for one process: `threads` threads
+#issuing `requests` operations between them. Returns per-key latencies and
+#errors, the wall clock span and the ids left on the server.
+def load_worker(client, ids, mix, formats, requests, threads, seed):
+    ids = IdPool(ids)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+    per_thread = shares(requests, threads)
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        local = {}
+        local_errors = {}
+        for _ in range(per_thread[index]):
+            name = rng.choices(names, weights)[0]
+            result = run_operation(client, ids, rng, name, rng.choice(formats))
+            if result is None:
+                continue
+            key, latency, ok = result
+            local.setdefault(key, []).append(latency)
+            local_errors[key] = local_errors.get(key, 0) + (0 if ok else 1)
+        with lock:
+            for key, values in local.items():
+                latencies.setdefault(key, []).extend(values)
+                errors[key] = errors.get(key, 0) + local_errors[key]
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(worker, range(threads)))
+    return {"latencies": latencies, "errors": errors, "started": started, "finished": time.time(),
+            "ids": ids.ids}
+
+def run_load(client, mix, formats, total_requests, concurrency, dataset_size, seed=0, processes=1):
+    delete_all_todos(client)
+    ids = seed_dataset(client, dataset_size, concurrency)
+
+    if processes > 1:
+        threads = max(1, math.ceil(concurrency / processes))
+        per_process = shares(total_requests, processes)
+        #Disjoint id slices so one process never deletes another's todos
+        parts = fan_out(client, processes, threads, load_worker, lambda index: (
+            ids[index::processes], mix, formats, per_process[index], threads, seed + index * threads))
+    else:
+        parts = [load_worker(client, ids, mix, formats, total_requests, concurrency, seed)]
+    wall_time = max(part["finished"] for part in parts) - min(part["started"] for part in parts)
+
+    latencies = {}
+    errors = {}
+    for part in parts:
+        for key, values in part["latencies"].items():
+            latencies.setdefault(key, []).extend(values)
+            errors[key] = errors.get(key, 0) + part["errors"][key]
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "benchmark": "load",
+        "config": {
+            "concurrency": concurrency,
+            "processes": processes,
+            "requests": total_requests,
+            "dataset_size": dataset_size,
+            "mix": mix,
+            "formats": formats,
+        },
+        "wall_time_s": wall_time,
+        "overall": latency_summary(all_latencies, sum(errors.values()), wall_time),
+        "endpoints": {key: latency_summary(latencies[key], errors[key], wall_time) for key in sorted(latencies)},
+    }
+
+def print_table(results):
+    print(f"{'endpoint':<32}{'count':>8}{'err':>6}{'rps':>10}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    rows = list(results["endpoints"].items()) + [("overall", results["overall"])]
+    for key, row in rows:
+        print(f"{key:<32}{row['count']:>8}{row['errors']:>6}{row['rps']:>10.1f}"
+              f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}{row['max_ms']:>9.2f}")
+
+def write_results(results, path):
+    if path:
+        with open(path, "w") as output:
+            json.dump(results, output, indent=2)
+        print(f"Results written to {path}")
+
+def load_command(args, client):
+    results = run_load(client, args.mix, args.formats.split(","), args.requests,
+                       args.concurrency, args.dataset_size, args.seed, process_count(args.processes))
+    print_table(results)
+    return results
+
+#One process's share of an open-loop run: requests offset, offset + stride, ...
+#of the `rate * duration` due from `start_at` (wall clock, so processes line up).
+#Returns the raw histograms and counters so shares can be merged exactly.
+def open_loop_worker(client, ids, rate, duration, mix, formats, concurrency, seed, offset=0, stride=1,
+                     start_at=None):
+    ids = IdPool(ids)
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    count = max(1, int(rate * duration))
+    interval = 1 / rate
+    histograms = {"response": LatencyHistogram(), "service": LatencyHistogram()}
+    endpoints = {}
+    errors = [0]
+    lock = threading.Lock()
+
+    def send(due, name, content_type, prepared):
+        key, method, path, kwargs, todo_id = prepared
+        start = time.perf_counter()
+        ok = send_operation(client, ids, name, content_type, method, path, kwargs, todo_id)
+        end = time.perf_counter()
+        with lock:
+            histograms["response"].record(end - due)
+            histograms["service"].record(end - start)
+            endpoints.setdefault(key, LatencyHistogram()).record(end - due)
+            if not ok:
+                errors[0] += 1
+
+    if start_at is not None and start_at > time.time():
+        time.sleep(start_at - time.time())
+    max_lag = 0.0
+    skipped = 0
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        start = time.perf_counter()
+        for index in range(offset, count, stride):
+            due = start + index * interval
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+            name = rng.choices(names, weights)[0]
+            content_type = rng.choice(formats)
+            prepared = prepare_operation(ids, rng, name, content_type)
+            if prepared is None:
+                skipped += 1
+                continue
+            executor.submit(send, due, name, content_type, prepared)
+        sent_for = time.perf_counter() - start
+    return {
+        "histograms": histograms, "endpoints": endpoints, "errors": errors[0], "skipped": skipped,
+        "scheduled": len(range(offset, count, stride)), "sent_for": sent_for, "max_lag": max_lag,
+        "started": started, "finished": time.time(), "ids": ids.ids,
+    }
+
+#Open loop: requests are due at fixed intervals whatever the server is doing, so
+#a slow response delays nothing but itself. Latency is measured from when the
+#request was due, not from when a free worker got round to sending it, which is
+#what corrects for coordinated omission: time spent queued behind a stalled
+#server shows up instead of being silently skipped. "service" is the uncorrected
+#send-to-response time a closed-loop benchmark would have reported.
+#With processes > 1 every process takes every processes-th request of the same
+#schedule and the per-process histograms are merged.
+def run_open_loop(client, ids, rate, duration, mix, formats, concurrency, seed, processes=1):
+    if processes > 1:
+        threads = max(1, math.ceil(concurrency / processes))
+        #Leave the processes time to start before the first request is due
+        start_at = time.time() + 0.5
+        parts = fan_out(client, processes, threads, open_loop_worker, lambda index: (
+            ids[index::processes], rate, duration, mix, formats, threads, seed + index, index, processes, start_at))
+    else:
+        parts = [open_loop_worker(client, ids, rate, duration, mix, formats, concurrency, seed)]
+
+    histograms = {"response": LatencyHistogram(), "service": LatencyHistogram()}
+    endpoints = {}
+    for part in parts:
+        for name, histogram in part["histograms"].items():
+            histograms[name].merge(histogram)
+        for key, histogram in part["endpoints"].items():
+            endpoints.setdefault(key, LatencyHistogram()).merge(histogram)
+    wall_time = max(part["finished"] for part in parts) - min(part["started"] for part in parts)
+    sent_for = max(part["sent_for"] for part in parts)
+    offered = sum(part["scheduled"] - part["skipped"] for part in parts)
+    completed = histograms["response"].total
+    step = {
+        "target_rps": rate,
+        "processes": processes,
+        "offered_rps": offered / sent_for if sent_for else 0.0,
+        "achieved_rps": completed / wall_time if wall_time else 0.0,
+        "errors": sum(part["errors"] for part in parts),
+        "skipped": sum(part["skipped"] for part in parts),
+        "wall_time_s": wall_time,
+        #How far behind schedule the dispatchers themselves fell, should stay near zero
+        "max_dispatch_lag_ms": max(part["max_lag"] for part in parts) * 1000,
+        "response": histograms["response"].summary(),
+        "service": histograms["service"].summary(),
+        "endpoints": {key: endpoints[key].summary() for key in sorted(endpoints)},
+    }
+    return step, [todo_id for part in parts for todo_id in part["ids"]]
+
+#The knee is the last rate the server keeps up with: throughput still tracks
+#the target and p90 hasn't blown past knee_factor times the lightest load's p90.
+#p99 of a few hundred requests at the low rates is too noisy to compare against.
+def find_knee(steps, knee_factor, min_ratio=0.95):
+    baseline = steps[0]["response"]["p90_ms"] if steps else 0.0
+    knee = None
+    below_knee = True
+    for step in steps:
+        step["saturated"] = (step["achieved_rps"] < step["target_rps"] * min_ratio or
+                             step["response"]["p90_ms"] > baseline * knee_factor)
+        below_knee = below_knee and not step["saturated"]
+        if below_knee:
+            knee = step["target_rps"]
+    return knee
+
+#Step the target rate up until the server saturates, one open-loop run per rate
+def run_rate_sweep(client, rates, duration, mix, formats, concurrency, dataset_size, knee_factor=3.0,
+                   past_knee=1, seed=0, processes=1):
+    delete_all_todos(client)
+    ids = seed_dataset(client, dataset_size, 4)
+    steps = []
+    saturated = 0
+    for number, rate in enumerate(rates):
+        set_phase(f"openloop {rate:g}/s")
+        step, ids = run_open_loop(client, ids, rate, duration, mix, formats, concurrency,
+                                  seed + number * processes, processes)
+        steps.append(step)
+        print(f"{rate:>8.0f}/s target  {step['achieved_rps']:>8.1f}/s achieved  "
+              f"p50 {step['response']['p50_ms']:>8.2f}ms  p99 {step['response']['p99_ms']:>8.2f}ms  "
+              f"(service p99 {step['service']['p99_ms']:.2f}ms)")
+        find_knee(steps, knee_factor)
+        if step["saturated"]:
+            saturated += 1
+            #Past the knee queues only grow, a step or two shows the shape of the curve
+            if saturated > past_knee:
+                break
+    knee = find_knee(steps, knee_factor)
+    return {
+        "benchmark": "openloop",
+        "config": {"rates": rates, "duration_s": duration, "concurrency": concurrency, "processes": processes,
+                   "mix": mix, "formats": formats, "dataset_size": dataset_size, "knee_factor": knee_factor},
+        "knee_rps": knee,
+        "curve": steps,
+    }
+
+def open_loop_command(args, client):
+    rates = ([float(rate) for rate in args.rates.split(",")] if args.rates
+             else geometric_sizes(args.start_rate, args.factor, args.max_rate))
+    results = run_rate_sweep(client, rates, args.duration, args.mix, args.formats.split(","), args.concurrency,
+                             args.dataset_size, args.knee_factor, args.past_knee, args.seed,
+                             process_count(args.processes))
+    print(f"{'target/s':>10}{'achieved/s':>12}{'err':>6}{'p50':>9}{'p90':>9}{'p99':>9}{'p99.9':>9}{'max':>9}"
+          f"{'svc p99':>9}")
+    for step in results["curve"]:
+        row = step["response"]
+        flag = "  <-- saturated" if step.get("saturated") else ""
+        print(f"{step['target_rps']:>10.0f}{step['achieved_rps']:>12.1f}{step['errors']:>6}{row['p50_ms']:>9.2f}"
+              f"{row['p90_ms']:>9.2f}{row['p99_ms']:>9.2f}{row['p999_ms']:>9.2f}{row['max_ms']:>9.2f}"
+              f"{step['service']['p99_ms']:>9.2f}{flag}")
+    if results["knee_rps"] is None:
+        print("Saturated at the lowest rate, lower --start-rate")
+    elif not any(step.get("saturated") for step in results["curve"]):
+        print(f"Not saturated up to {results['knee_rps']:.0f} requests/s")
+    else:
+        print(f"Knee at {results['knee_rps']:.0f} requests/s")
+    return results
+
+#"90s", "30m", "4h", "1d" or plain seconds
+def parse_duration(text):
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    text = text.strip().lower()
+    try:
+        if text and text[-1] in units:
+            return float(text[:-1]) * units[text[-1]]
+        return float(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Not a duration: {text}")
+
+#Mann-Kendall test for a monotonic trend in a series, with Sen's slope (per step)
+#for its size. Makes no assumption about the distribution, so one slow window
+#doesn't look like a trend the way it can in a least-squares fit. A step (the
+#level shifts partway through and stays there) counts as a trend too, which is
+#what a soak wants to hear about: the server got slower and stayed slower.
+def mann_kendall(values):
+    n = len(values)
+    if n < 4:
+        return {"n": n, "z": 0.0, "p": 1.0, "slope": 0.0}
+    score = 0
+    slopes = []
+    for i in range(n - 1):
+        for j in range(i + 1, n):
+            difference = values[j] - values[i]
+            score += (difference > 0) - (difference < 0)
+            slopes.append(difference / (j - i))
+    ties = {}
+    for value in values:
+        ties[value] = ties.get(value, 0) + 1
+    variance = (n * (n - 1) * (2 * n + 5) - sum(t * (t - 1) * (2 * t + 5) for t in ties.values())) / 18
+    if variance <= 0 or score == 0:
+        z = 0.0
+    else:
+        z = (score - 1 if score > 0 else score + 1) / math.sqrt(variance)
+    return {"n": n, "z": z, "p": math.erfc(abs(z) / math.sqrt(2)), "slope": statistics.median(slopes)}
+
+#A series drifts when the trend is significant at `alpha` and Sen's slope adds
+#up to at least `min_change` of the series median over the whole run
+def drift(values, alpha=0.01, min_change=0.2):
+    trend = mann_kendall(values)
+    baseline = statistics.median(values) if values else 0.0
+    change = trend["slope"] * (len(values) - 1) / baseline if baseline else 0.0
+    trend["change"] = change
+    trend["drifting"] = trend["p"] < alpha and abs(change) >= min_change
+    return trend
+
+#Drift in the windows after the warm-up: latency and throughput either way,
+#server memory only upwards
+def analyse_soak(windows, warmup=1, alpha=0.01, min_change=0.2):
+    steady = windows[warmup:] if len(windows) > warmup else windows
+    analysis = {"windows": len(windows), "analysed": len(steady)}
+    for key in ("p50_ms", "p99_ms"):
+        analysis[key] = drift([window["response"][key] for window in steady], alpha, min_change)
+    analysis["achieved_rps"] = drift([window["achieved_rps"] for window in steady], alpha, min_change)
+    rss = [window["rss_mb"] for window in steady if window.get("rss_mb") is not None]
+    if rss:
+        #Any significant upward trend counts, a leak is a leak however slow
+        memory = drift(rss, alpha, 0.0)
+        memory["growing"] = memory["drifting"] and memory["slope"] > 0
+        analysis["rss_mb"] = memory
+    return analysis
+
+def print_soak_analysis(analysis):
+    print(f"Analysed {analysis['analysed']} of {analysis['windows']} windows:")
+    for key in ("p50_ms", "p99_ms", "achieved_rps", "rss_mb"):
+        trend = analysis.get(key)
+        if trend is None:
+            continue
+        verdict = "DRIFTING" if trend["drifting"] else "stable"
+        if key == "rss_mb":
+            verdict = "GROWING, possible leak" if trend["growing"] else "stable"
+        print(f"  {key:<14} {verdict:<24} change {trend['change']:+7.1%}  p={trend['p']:.4f}")
+
+#Fold todos back to the target population between windows, the mix creates more than it deletes
+def keep_population(client, ids, population, rng):
+    if len(ids) < population:
+        payloads = [todo_payload(rng, "json")["json"] for _ in range(population - len(ids))]
+        ids.extend(todo_id for todo_id in pipelined_create_todos(payloads, client) if todo_id)
+    while len(ids) > population:
+        client.delete_todo(ids.pop())
+    return ids
+
+#Run the mix open-loop at a steady rate for `duration` seconds in fixed,
+#back-to-back windows, each with percentiles of its own. Every finished window
+#is appended to `checkpoint` (JSON lines) so an interrupted soak can still be
+#analysed with `soak --analyse`.
+def run_soak(client, duration, window, rate, mix, formats, concurrency, population, checkpoint,
+             sampler=None, processes=1, seed=0):
+    delete_all_todos(client)
+    rng = random.Random(seed)
+    ids = keep_population(client, [], population, rng)
+    config = {"duration_s": duration, "window_s": window, "rate": rate, "mix": mix, "formats": formats,
+              "concurrency": concurrency, "population": population, "processes": processes}
+    windows = []
+    with open(checkpoint, "a") as output:
+        output.write(json.dumps({"config": config, "started": time.time()}) + "\n")
+        started = time.perf_counter()
+        try:
+            while time.perf_counter() - started + window <= duration:
+                number = len(windows)
+                set_phase(f"soak window {number}")
+                step, ids = run_open_loop(client, ids, rate, window, mix, formats, concurrency,
+                                          seed + number * processes, processes)
+                step["window"] = number
+                step["elapsed_s"] = time.perf_counter() - started
+                step["population"] = len(ids)
+                if sampler is not None and sampler.samples:
+                    step["rss_mb"] = sampler.samples[-1]["rss_bytes"] / 1024 / 1024
+                    step["threads"] = sampler.samples[-1]["threads"]
+                windows.append(step)
+                output.write(json.dumps({"window": step}) + "\n")
+                output.flush()
+                print(f"[{step['elapsed_s'] / 60:7.1f}m] window {number:<4} {step['achieved_rps']:8.1f}/s  "
+                      f"p50 {step['response']['p50_ms']:7.2f}ms  p99 {step['response']['p99_ms']:8.2f}ms  "
+                      f"err {step['errors']:<4} todos {step['population']:<6}"
+                      + (f" rss {step['rss_mb']:.1f}MB" if "rss_mb" in step else ""))
+                ids = keep_population(client, ids, population, rng)
+        except KeyboardInterrupt:
+            print(f"Interrupted after {len(windows)} windows, analysing what finished")
+    return {"benchmark": "soak", "config": config, "checkpoint": checkpoint, "windows": windows}
+
+#Windows from a checkpoint file, the last run in it if it holds several
+def read_checkpoint(path):
+    windows = []
+    config = None
+    with open(path) as source:
+        for line in source:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                #A soak killed mid-write leaves half a line behind
+                continue
+            if "config" in entry:
+                config, windows = entry["config"], []
+            elif "window" in entry:
+                windows.append(entry["window"])
+    return config, windows
+
+def soak_command(args, client):
+    if args.analyse:
+        config, windows = read_checkpoint(args.analyse)
+        results = {"benchmark": "soak", "config": config, "checkpoint": args.analyse, "windows": windows}
+    else:
+        results = run_soak(client, args.duration, args.window, args.rate, args.mix, args.formats.split(","),
+                           args.concurrency, args.population, args.checkpoint, args.sampler,
+                           process_count(args.processes), args.seed)
+    results["analysis"] = analyse_soak(results["windows"], args.warmup_windows, args.alpha, args.min_change)
+    print_soak_analysis(results["analysis"])
+    return results
+
+#Least-squares fit of latency = c * size^exponent on a log-log scale
+def fit_power_law(sizes, values):
+    points = [(math.log(size), math.log(value)) for size, value in zip(sizes, values) if size > 0 and value > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if spread == 0:
+        return None
+    exponent = sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+    return {"exponent": exponent, "coefficient": math.exp(mean_y - exponent * mean_x)}
+
+def geometric_sizes(start, factor, maximum):
+    sizes = []
+    size = start
+    while size <= maximum:
+        sizes.append(int(size))
+        size *= factor
+    return sizes
+
+#Grow the dataset step by step and time the listing and id endpoints at each size
+def run_scaling(client, sizes, samples, limit, superlinear=1.1, seed=0):
+    delete_all_todos(client)
+    rng = random.Random(seed)
+    ids = []
+    steps = []
+
+    for size in sizes:
+        #Only seed the difference from the previous step
+        payloads = [todo_payload(rng, "json")["json"] for _ in range(size - len(ids))]
+        ids.extend(todo_id for todo_id in pipelined_create_todos(payloads, client, limit) if todo_id)
+
+        step = {"size": len(ids)}
+        for content_type in ("json", "xml"):
+            headers = xml_headers if content_type == "xml" else {}
+            for name, path_for in (("list", lambda: "/todos"), ("get", lambda: f"/todos/{rng.choice(ids)}")):
+                latencies = []
+                payload_bytes = 0
+                for _ in range(samples):
+                    start = time.perf_counter()
+                    response = client.request("GET", path_for(), headers=headers)
+                    latencies.append(time.perf_counter() - start)
+                    payload_bytes = len(response.content)
+                latencies.sort()
+                step[f"{name}_{content_type}"] = {
+                    "p50_ms": percentile(latencies, 50) * 1000,
+                    "p95_ms": percentile(latencies, 95) * 1000,
+                    "bytes": payload_bytes,
+                }
+        steps.append(step)
+        print(f"size {step['size']:>8}: " + "  ".join(
+            f"{key} {value['p50_ms']:.2f}ms/{value['bytes']}B" for key, value in step.items() if key != "size"))
+
+    fits = {}
+    for key in steps[0]:
+        if key == "size":
+            continue
+        fit = fit_power_law([step["size"] for step in steps], [step[key]["p50_ms"] for step in steps])
+        if fit:
+            fit["superlinear"] = fit["exponent"] > superlinear
+        fits[key] = fit
+    return {
+        "benchmark": "scaling",
+        "config": {"sizes": sizes, "samples": samples, "limit": limit, "superlinear_exponent": superlinear},
+        "steps": steps,
+        "fits": fits,
+    }
+
+def scaling_command(args, client):
+    sizes = geometric_sizes(args.start, args.factor, args.max_size)
+    results = run_scaling(client, sizes, args.samples, args.limit, args.superlinear, args.seed)
+    for key, fit in results["fits"].items():
+        if fit:
+            flag = "  <-- super-linear" if fit["superlinear"] else ""
+            print(f"{key:<10} latency ~ size^{fit['exponent']:.2f}{flag}")
+    return results
+
+#Items per second seeding the same payloads three ways: one requests call per
+#todo, concurrent asyncio POSTs and pipelined POSTs on persistent sockets
+def run_seed(client, count, connections, depth, seed=0):
+    rng = random.Random(seed)
+    payloads = [todo_payload(rng, "json")["json"] for _ in range(count)]
+    drivers = {
+        "requests": lambda: [client.create_todo(payload) for payload in payloads],
+        #Shares the tracker so the clean up between drivers sees these todos
+        "asyncio": lambda: async_client.run(async_client.seed_todos, payloads, base_url=client.base_url,
+                                            limit=connections, tracker=client.tracker),
+        "pipelined": lambda: pipelined_create_todos(payloads, client, connections, depth),
+    }
+    results = {}
+    for name, driver in drivers.items():
+        delete_all_todos(client)
+        start = time.perf_counter()
+        driver()
+        elapsed = time.perf_counter() - start
+        results[name] = {"elapsed_s": elapsed, "items_per_s": count / elapsed}
+    delete_all_todos(client)
+    return {
+        "benchmark": "seed",
+        "config": {"count": count, "connections": connections, "depth": depth},
+        "drivers": results,
+    }
+
+def seed_command(args, client):
+    results = run_seed(client, args.count, args.connections, args.depth, args.seed)
+    baseline = results["drivers"]["requests"]["items_per_s"]
+    for name, row in results["drivers"].items():
+        print(f"{name:<10} {row['items_per_s']:>10.0f} items/s  {row['items_per_s'] / baseline:>5.1f}x")
+    return results
+
+#Fire generated valid, boundary and malformed POST/PUT payloads concurrently and
+#classify every response against the documented and actual behavior
+def run_fuzz(client, count, concurrency, methods, formats, max_size, outlier_factor=10, seed=0, kinds=None):
+    delete_all_todos(client)
+    rng = random.Random(seed)
+    ids = [todo_id for todo_id in pipelined_create_todos(
+        [todo_payload(rng, "json")["json"] for _ in range(max(concurrency * 4, 16))], client, concurrency) if todo_id]
+    cases = generate_cases(count, methods, formats, max_size, seed, kinds)
+
+    def send(numbered):
+        number, (method, case) = numbered
+        path = "/todos" if method == "POST" else f"/todos/{ids[number % len(ids)]}"
+        start = time.perf_counter()
+        try:
+            status = client.request(method, path, data=case.body, headers=case.headers).status_code
+            outcome = case.classify(status)
+        except Exception as error:
+            status, outcome = type(error).__name__, "error"
+        return method, case, status, outcome, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, enumerate(cases)))
+    wall_time = time.perf_counter() - start
+
+    groups = {}
+    for method, case, status, outcome, latency in results:
+        group = groups.setdefault(f"{method} {case.kind} [{case.content_type}]", {
+            "count": 0, "statuses": {}, "outcomes": {}, "latencies": [], "bytes": 0,
+        })
+        group["count"] += 1
+        group["statuses"][str(status)] = group["statuses"].get(str(status), 0) + 1
+        group["outcomes"][outcome] = group["outcomes"].get(outcome, 0) + 1
+        group["latencies"].append(latency)
+        group["bytes"] += len(case.body)
+    for group in groups.values():
+        latencies = sorted(group.pop("latencies"))
+        group["mean_bytes"] = group.pop("bytes") / group["count"]
+        group["p50_ms"] = percentile(latencies, 50) * 1000
+        group["p99_ms"] = percentile(latencies, 99) * 1000
+        group["max_ms"] = latencies[-1] * 1000
+
+    #Outliers are measured against the median of plain valid payloads
+    baseline = sorted(latency for _, case, _, _, latency in results if case.kind == "valid")
+    threshold = percentile(baseline, 50) * outlier_factor if baseline else 0.0
+    outliers = sorted(
+        ({"method": method, "kind": case.kind, "format": case.content_type, "bytes": len(case.body),
+          "status": status, "latency_ms": latency * 1000}
+         for method, case, status, _, latency in results if baseline and latency > threshold),
+        key=lambda outlier: outlier["latency_ms"], reverse=True,
+    )
+
+    outcomes = {}
+    for _, _, status, outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    server_errors = sum(1 for _, _, status, outcome, _ in results if outcome == "error" or
+                        (isinstance(status, int) and status >= 500))
+    return {
+        "benchmark": "fuzz",
+        "config": {"count": count, "concurrency": concurrency, "methods": methods, "formats": formats,
+                   "max_size": max_size, "outlier_factor": outlier_factor, "seed": seed},
+        "wall_time_s": wall_time,
+        "rps": len(results) / wall_time if wall_time else 0.0,
+        "outcomes": outcomes,
+        "error_rate": server_errors / len(results) if results else 0.0,
+        "unexpected_rate": outcomes.get("unexpected", 0) / len(results) if results else 0.0,
+        "outlier_threshold_ms": threshold * 1000,
+        "outliers": outliers[:20],
+        "groups": dict(sorted(groups.items())),
+    }
+
+def fuzz_command(args, client):
+    kinds = args.kinds.split(",") if args.kinds else None
+    results = run_fuzz(client, args.count, args.concurrency, args.methods.split(","), args.formats.split(","),
+                       args.max_size, args.outlier_factor, args.seed, kinds)
+    print(f"{'case':<40}{'count':>7}{'documented':>12}{'actual':>8}{'unexpected':>12}{'error':>7}"
+          f"{'p50':>9}{'p99':>9}{'max':>9}")
+    for key, group in results["groups"].items():
+        outcomes = group["outcomes"]
+        print(f"{key:<40}{group['count']:>7}{outcomes.get('documented', 0):>12}{outcomes.get('actual', 0):>8}"
+              f"{outcomes.get('unexpected', 0):>12}{outcomes.get('error', 0):>7}"
+              f"{group['p50_ms']:>9.2f}{group['p99_ms']:>9.2f}{group['max_ms']:>9.2f}")
+    print(f"{results['rps']:.1f} requests/s, error rate {results['error_rate']:.2%}, "
+          f"unexpected {results['unexpected_rate']:.2%}, {len(results['outliers'])} outliers "
+          f"over {results['outlier_threshold_ms']:.2f}ms")
+    for outlier in results["outliers"][:5]:
+        print(f"  {outlier['method']} {outlier['kind']} [{outlier['format']}] {outlier['bytes']}B "
+              f"-> {outlier['status']} in {outlier['latency_ms']:.2f}ms")
+    return results
+
+#A /todos body shaped like the server's, doneStatus as a string and ids as strings
+def listing_payload(size, seed=0):
+    rng = random.Random(seed)
+    todos = [{"id": str(index), "title": f"bench {rng.randrange(1 << 30)}",
+              "doneStatus": "true" if rng.random() < 0.5 else "false", "description": "load test"}
+             for index in range(1, size + 1)]
+    return json.dumps({"todos": todos}).encode("utf-8")
+
+#Best-of-repeats time to decode a listing with each available backend, both to
+#plain dicts and typed into Todo records
+def run_decode(sizes, repeats, backends):
+    steps = []
+    for size in sizes:
+        content = listing_payload(size)
+        step = {"size": size, "bytes": len(content)}
+        for name in backends:
+            decode = json_decoders[name]
+            raw = []
+            typed = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                decode(content)
+                raw.append(time.perf_counter() - start)
+                start = time.perf_counter()
+                decode_todos(content, decode)
+                typed.append(time.perf_counter() - start)
+            step[name] = {"decode_ms": min(raw) * 1000, "typed_ms": min(typed) * 1000}
+        steps.append(step)
+    return {
+        "benchmark": "decode",
+        "config": {"sizes": sizes, "repeats": repeats, "backends": backends},
+        "steps": steps,
+    }
+
+def decode_command(args, client):
+    backends = args.backends.split(",") if args.backends else list(json_decoders)
+    missing = [name for name in backends if name not in json_decoders]
+    if missing:
+        raise SystemExit(f"JSON decoder not installed: {', '.join(missing)}")
+    results = run_decode([int(size) for size in args.sizes.split(",")], args.repeats, backends)
+
+    print(f"{'size':>8}{'bytes':>12}  " + "".join(f"{name + ' raw/typed ms':>26}" for name in backends))
+    for step in results["steps"]:
+        cells = "".join(f"{step[name]['decode_ms']:>13.2f}{step[name]['typed_ms']:>13.2f}" for name in backends)
+        print(f"{step['size']:>8}{step['bytes']:>12}  {cells}")
+    return results
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmarks for the todo manager API")
+    parser.add_argument("--url", default=os.environ.get("TODO_SERVER_URL", url), help="Server under test")
+    parser.add_argument("--fake", action="store_true", help="Benchmark the in-process fake server")
+    parser.add_argument("--out", help="Write machine-readable JSON results to this file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("load", help="Closed-loop request mix with latency percentiles")
+    load.add_argument("--concurrency", type=int, default=8)
+    load.add_argument("--requests", type=int, default=2000)
+    load.add_argument("--dataset-size", type=int, default=100)
+    load.add_argument("--mix", type=parse_mix, default=default_mix, help=f"Operation weights, default {default_mix}")
+    load.add_argument("--formats", default="json,xml", help="Content types to exercise")
+    load.add_argument("--processes", type=int, default=1, help="Worker processes, 0 for one per core")
+    load.add_argument("--seed", type=int, default=0)
+    load.set_defaults(handler=load_command)
+
+    open_loop = commands.add_parser("openloop", help="Constant-rate open-loop sweep to find the saturation knee")
+    open_loop.add_argument("--rates", help="Comma separated target rates, overrides the geometric sweep")
+    open_loop.add_argument("--start-rate", type=float, default=50)
+    open_loop.add_argument("--factor", type=float, default=2)
+    open_loop.add_argument("--max-rate", type=float, default=6400)
+    open_loop.add_argument("--duration", type=float, default=5, help="Seconds at each rate")
+    open_loop.add_argument("--concurrency", type=int, default=64, help="Most requests in flight at once")
+    open_loop.add_argument("--dataset-size", type=int, default=100)
+    open_loop.add_argument("--mix", type=parse_mix, default=default_mix,
+                           help=f"Operation weights, default {default_mix}")
+    open_loop.add_argument("--formats", default="json,xml", help="Content types to exercise")
+    open_loop.add_argument("--knee-factor", type=float, default=3,
+                           help="p90 growth over the lightest load that counts as saturated")
+    open_loop.add_argument("--past-knee", type=int, default=1, help="Saturated steps to run before stopping")
+    open_loop.add_argument("--processes", type=int, default=1, help="Worker processes, 0 for one per core")
+    open_loop.add_argument("--seed", type=int, default=0)
+    open_loop.set_defaults(handler=open_loop_command)
+
+    scaling = commands.add_parser("scaling", help="How GET /todos and GET /todos/{id} grow with dataset size")
+    scaling.add_argument("--start", type=int, default=1000)
+    scaling.add_argument("--factor", type=float, default=10)
+    scaling.add_argument("--max-size", type=int, default=100000)
+    scaling.add_argument("--samples", type=int, default=20, help="Requests timed per endpoint at each size")
+    scaling.add_argument("--limit", type=int, default=32, help="Concurrent POSTs while seeding")
+    scaling.add_argument("--superlinear", type=float, default=1.1, help="Exponent above which growth is flagged")
+    scaling.add_argument("--seed", type=int, default=0)
+    scaling.set_defaults(handler=scaling_command)
+
+    seed = commands.add_parser("seed", help="POST throughput: requests loop vs asyncio vs HTTP/1.1 pipelining")
+    seed.add_argument("--count", type=int, default=2000)
+    seed.add_argument("--connections", type=int, default=4)
+    seed.add_argument("--depth", type=int, default=64, help="Pipelined requests in flight per connection")
+    seed.add_argument("--seed", type=int, default=0)
+    seed.set_defaults(handler=seed_command)
+
+    fuzz = commands.add_parser("fuzz", help="Generated valid, boundary and malformed POST/PUT payloads")
+    fuzz.add_argument("--count", type=int, default=2000)
+    fuzz.add_argument("--concurrency", type=int, default=8)
+    fuzz.add_argument("--methods", default="POST,PUT")
+    fuzz.add_argument("--formats", default="json,xml")
+    fuzz.add_argument("--max-size", type=int, default=65536, help="Largest generated title in bytes")
+    fuzz.add_argument("--outlier-factor", type=float, default=10,
+                      help="Flag requests slower than this multiple of the valid-payload median")
+    fuzz.add_argument("--kinds", help=f"Subset of: {','.join(generators)}")
+    fuzz.add_argument("--seed", type=int, default=0)
+    fuzz.set_defaults(handler=fuzz_command)
+
+    decode = commands.add_parser("decode", help="Compare JSON decoders on /todos payloads, no server needed")
+    decode.add_argument("--sizes", default="1000,10000,100000", help="Comma separated listing sizes")
+    decode.add_argument("--repeats", type=int, default=5)
+    decode.add_argument("--backends", help="Comma separated subset of the installed decoders")
+    decode.set_defaults(handler=decode_command, offline=True)
+
+    soak = commands.add_parser("soak", help="Hours-long steady mix in fixed windows, drift and leak detection")
+    soak.add_argument("--duration", type=parse_duration, default=parse_duration("1h"), help="e.g. 90s, 30m, 4h")
+    soak.add_argument("--window", type=parse_duration, default=parse_duration("60s"),
+                      help="Length of each fixed window")
+    soak.add_argument("--rate", type=float, default=50, help="Target requests/s, keep it below the knee")
+    soak.add_argument("--concurrency", type=int, default=32, help="Most requests in flight at once")
+    soak.add_argument("--population", type=int, default=500, help="Todos kept on the server between windows")
+    soak.add_argument("--mix", type=parse_mix, default=default_mix, help=f"Operation weights, default {default_mix}")
+    soak.add_argument("--formats", default="json,xml", help="Content types to exercise")
+    soak.add_argument("--checkpoint", default="soak.jsonl", help="Append each finished window to this file")
+    soak.add_argument("--analyse", metavar="CHECKPOINT",
+                      help="Analyse an earlier (or interrupted) soak, no server needed")
+    soak.add_argument("--warmup-windows", type=int, default=1, help="Windows left out of the drift analysis")
+    soak.add_argument("--alpha", type=float, default=0.01, help="Significance level of the trend tests")
+    soak.add_argument("--min-change", type=float, default=0.2,
+                      help="Smallest latency/throughput change over the run that counts as drift")
+    soak.add_argument("--processes", type=int, default=1, help="Worker processes, 0 for one per core")
+    soak.add_argument("--seed", type=int, default=0)
+    soak.set_defaults(handler=soak_command)
+
+    for command in (load, open_loop, scaling, seed, fuzz, soak):
+        command.add_argument("--sample-server", action="store_true",
+                             help="Sample the server's CPU, memory and threads from /proc while running")
+        command.add_argument("--server-pid", type=int, help="Server PID, found from the listening port by default")
+        command.add_argument("--sample-interval", type=float, default=0.2)
+    return parser
+
+def start_sampler(args, base_url):
+    pid = args.server_pid or find_listening_pid(urlsplit(base_url).port or 80)
+    if pid is None:
+        raise SystemExit(f"No process we can see listens on {base_url}, pass --server-pid")
+    return ResourceSampler(pid, args.sample_interval, lambda: dict(current_phase)).start()
+
+def print_resources(resources):
+    whose = "this process, includes the client" if resources["own_process"] else f"pid {resources['pid']}"
+    print(f"Server resources ({whose}), {resources['samples']} samples:")
+    print(f"{'phase':<28}{'cpu s':>8}{'cpu %':>8}{'rss MB':>9}{'growth':>9}{'threads':>9}")
+    for phase, row in resources["by_phase"].items():
+        print(f"{phase:<28}{row['cpu_s']:>8.2f}{row['cpu_percent']:>8.1f}{row['rss_max_mb']:>9.1f}"
+              f"{row['rss_growth_mb']:>+9.2f}{row['threads_max']:>9}")
+    memory = resources["memory"]
+    if memory["growing"]:
+        print(f"WARNING: server memory grew {memory['growth_mb']:.1f}MB ({memory['slope_mb_per_min']:.1f}MB/min, "
+              f"r2={memory['r2']:.2f}), possible leak")
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, "offline", False) or getattr(args, "analyse", None):
+        write_results(args.handler(args, None), args.out)
+        return
+
+    server = start_fake_server() if args.fake else None
+    base_url = server.url if server else args.url
+
+    client = TodoClient(base_url, pool_size=max(getattr(args, "concurrency", 1), 10))
+    sampler = start_sampler(args, base_url) if args.sample_server else None
+    args.sampler = sampler
+    #Benchmarks wipe and reseed the server, put the original todos back afterwards
+    set_phase("snapshot")
+    snapshot = StateSnapshot.capture(client)
+    try:
+        set_phase(args.command)
+        results = args.handler(args, client)
+        results["url"] = base_url
+        if sampler is not None:
+            set_phase(None)
+            sampler.stop()
+            results["server_resources"] = sampler.report("phase")
+            print_resources(results["server_resources"])
+        write_results(results, args.out)
+    finally:
+        set_phase("restore")
+        restore_state(snapshot, client)
+        client.close()
+        if sampler is not None:
+            sampler.stop()
+        if server:
+            server.stop()
+
+if __name__ == "__main__":
+    main()
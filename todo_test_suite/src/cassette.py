@@ -0,0 +1,265 @@
+import base64
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from urllib.parse import urlsplit
+
+#Record/replay of the HTTP exchanges a test makes, one gzipped cassette per test.
+#   TODO_CASSETTE=record   run against a live server and write tests/cassettes/...
+#   TODO_CASSETTE=replay   serve responses from the cassettes, falling back to any
+#                          cassette with the same request, then to the network
+#   TODO_CASSETTE=strict   like replay, but a request that isn't in the test's
+#                          cassette fails the test
+#TODO_CASSETTE_DIR overrides where the cassettes live. Exchanges made by
+#session-scoped fixtures go to one session cassette that every run loads, so a
+#subset of the tests replays as well as the whole suite.
+
+modes = ("record", "replay", "strict")
+cassette_version = 1
+
+class CassetteMismatch(AssertionError):
+    pass
+
+#Requests are matched on method, path, the headers that change the response
+#and a digest of the body, never on host/port so a recording made against an
+#ephemeral fake server still replays
+def request_key(method, path, headers, body):
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    digest = hashlib.blake2b(body or b"", digest_size=8).hexdigest()
+    return f"{method} {path} accept={headers.get('Accept', '')} type={headers.get('Content-Type', '')} body={digest}"
+
+def encode_body(body):
+    try:
+        return {"text": body.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"base64": base64.b64encode(body).decode("ascii")}
+
+def decode_body(stored):
+    if "base64" in stored:
+        return base64.b64decode(stored["base64"])
+    return stored["text"].encode("utf-8")
+
+#The interactions of one test, in the order they happened, indexed by request key.
+#A key seen more than once (e.g. GET /todos before and after a POST) replays its
+#responses in recorded order.
+class Cassette:
+    def __init__(self, path, interactions=None):
+        self.path = path
+        self.interactions = interactions or []
+        self.index = {}
+        for position, interaction in enumerate(self.interactions):
+            self.index.setdefault(interaction["key"], []).append(position)
+        self._cursor = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, "rt", encoding="utf-8") as source:
+            data = json.load(source)
+        if data.get("version") != cassette_version:
+            raise ValueError(f"Unsupported cassette version in {path}")
+        return cls(path, data["interactions"])
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        data = {"version": cassette_version, "index": self.index, "interactions": self.interactions}
+        with gzip.open(self.path, "wt", encoding="utf-8") as output:
+            json.dump(data, output, separators=(",", ":"))
+
+    def record(self, key, request, response=None, error=None):
+        interaction = {"key": key, "method": request.method, "path": urlsplit(request.url).path}
+        if error is not None:
+            interaction["error"] = type(error).__name__
+        else:
+            interaction["status"] = response.status_code
+            interaction["reason"] = response.reason
+            interaction["headers"] = dict(response.headers)
+            interaction["body"] = encode_body(response.content)
+        with self._lock:
+            self.index.setdefault(key, []).append(len(self.interactions))
+            self.interactions.append(interaction)
+
+    #Next unplayed interaction for this key, or None
+    def play(self, key):
+        with self._lock:
+            positions = self.index.get(key, [])
+            cursor = self._cursor.get(key, 0)
+            if cursor >= len(positions):
+                return None
+            self._cursor[key] = cursor + 1
+            return self.interactions[positions[cursor]]
+
+    def first(self, key):
+        positions = self.index.get(key)
+        return self.interactions[positions[0]] if positions else None
+
+#Sends through the live adapter in record mode, answers from the active cassette otherwise
+class CassetteAdapter(HTTPAdapter):
+    def __init__(self, library, live_adapter):
+        super().__init__()
+        self.library = library
+        self.live_adapter = live_adapter
+
+    def send(self, request, **kwargs):
+        key = request_key(request.method, request.path_url, request.headers, request.body)
+        cassette = self.library.active()
+
+        if self.library.mode == "record":
+            try:
+                response = self.live_adapter.send(request, **kwargs)
+                #Read the body now so streamed responses can be recorded too
+                response.content
+            except requests.exceptions.RequestException as error:
+                if cassette is not None:
+                    cassette.record(key, request, error=error)
+                raise
+            if cassette is not None:
+                cassette.record(key, request, response)
+            return response
+
+        interaction = cassette.play(key) if cassette is not None else None
+        if interaction is None and self.library.mode == "strict":
+            name = cassette.path if cassette is not None else "no cassette"
+            raise CassetteMismatch(f"No recorded response for {key} in {name}")
+        if interaction is None:
+            interaction = self.library.lookup(key)
+        if interaction is None:
+            return self.live_adapter.send(request, **kwargs)
+        return self.build_response(request, interaction)
+
+    def build_response(self, request, interaction):
+        if "error" in interaction:
+            error = getattr(requests.exceptions, interaction["error"], requests.exceptions.ConnectionError)
+            raise error(f"Replayed {interaction['error']} for {request.method} {request.path_url}", request=request)
+        body = decode_body(interaction["body"])
+        response = requests.Response()
+        response.status_code = interaction["status"]
+        response.reason = interaction["reason"]
+        response.headers = CaseInsensitiveDict(interaction["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.raw = io.BytesIO(body)
+        response._content = body
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        self.live_adapter.close()
+
+#All cassettes under one directory, with the one for the running test inserted
+class CassetteLibrary:
+    def __init__(self, directory, mode):
+        if mode not in modes:
+            raise ValueError(f"TODO_CASSETTE must be one of {', '.join(modes)}, not {mode}")
+        self.directory = directory
+        self.mode = mode
+        self.cassette = None
+        self.session_path = os.path.join(directory, "_session.json.gz")
+        self.session_cassette = self.open(self.session_path)
+        #Nesting depth of session-scoped fixture setup/teardown in progress
+        self._session_depth = 0
+        self._shared_index = None
+
+    def path_for(self, nodeid):
+        module, _, name = nodeid.partition("::")
+        module = os.path.splitext(os.path.basename(module))[0]
+        name = re.sub(r"[^\w\[\].-]+", "_", name)
+        return os.path.join(self.directory, module, f"{name}.json.gz")
+
+    def open(self, path):
+        if self.mode == "record" or not os.path.exists(path):
+            return Cassette(path)
+        return Cassette.load(path)
+
+    def insert(self, nodeid):
+        self.cassette = self.open(self.path_for(nodeid))
+
+    def eject(self):
+        if self.mode == "record" and self.cassette is not None:
+            self.cassette.save()
+        self.cassette = None
+
+    def enter_session(self):
+        self._session_depth += 1
+
+    def leave_session(self):
+        self._session_depth = max(0, self._session_depth - 1)
+
+    #The session cassette while a session fixture is being set up or torn down
+    def active(self):
+        return self.session_cassette if self._session_depth else self.cassette
+
+    def save_session(self):
+        if self.mode == "record" and self.session_cassette.interactions:
+            self.session_cassette.save()
+
+    #Non-strict replay: first recorded response for this request in any cassette,
+    #so running a subset of the tests still finds the session fixtures' requests
+    def lookup(self, key):
+        if self._shared_index is None:
+            self._shared_index = {}
+            for root, _, files in os.walk(self.directory):
+                for name in sorted(files):
+                    if name.endswith(".json.gz"):
+                        cassette = Cassette.load(os.path.join(root, name))
+                        for cassette_key in cassette.index:
+                            self._shared_index.setdefault(cassette_key, cassette.first(cassette_key))
+        return self._shared_index.get(key)
+
+    #Route a TodoClient's session through the cassettes. Pipelined creates would
+    #go around the session, so they are turned off.
+    def attach(self, client):
+        client.pipelining = False
+        adapter = CassetteAdapter(self, client.adapter)
+        client.session.mount("http://", adapter)
+        client.session.mount("https://", adapter)
+        return adapter
+
+#Inserts each test's cassette around its setup, call and teardown, and switches
+#to the session cassette while session-scoped fixtures set up or tear down
+#(which happens inside whichever test runs first or last)
+class CassettePlugin:
+    def __init__(self, library):
+        self.library = library
+        self._tearing_down = set()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item):
+        self.library.insert(item.nodeid)
+        yield
+        self.library.eject()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef):
+        if fixturedef.scope != "session":
+            yield
+            return
+        self.library.enter_session()
+        outcome = yield
+        self.library.leave_session()
+        if outcome.excinfo is None:
+            #Finalizers run last-in first-out: this one runs before the fixture's
+            #own teardown, and pytest_fixture_post_finalizer after it
+            fixturedef.addfinalizer(lambda: self._start_teardown(fixturedef))
+
+    def _start_teardown(self, fixturedef):
+        self._tearing_down.add(fixturedef)
+        self.library.enter_session()
+
+    def pytest_fixture_post_finalizer(self, fixturedef):
+        if fixturedef in self._tearing_down:
+            self._tearing_down.discard(fixturedef)
+            self.library.leave_session()
+
+    def pytest_sessionfinish(self):
+        self.library.save_session()
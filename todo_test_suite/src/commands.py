@@ -1,41 +1,821 @@
+import os
+import re
+import json
+import socket
+import hashlib
 import requests
 import time
+import random
 import pytest
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict, namedtuple
+from dataclasses import dataclass, replace
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+#Optional faster JSON backends, the stdlib decoder is used when neither is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
 
 url = "http://localhost:4567"
 url_shutdown = "http://localhost:4567/shutdown"
 url_todos = "http://localhost:4567/todos"
 
-def check_server_status():
-    try: 
-        response = requests.get(url)
+#Available JSON decoders, fastest first. TODO_JSON_DECODER picks one by name.
+json_decoders = {}
+if orjson is not None:
+    json_decoders["orjson"] = orjson.loads
+if msgspec is not None:
+    json_decoders["msgspec"] = msgspec.json.decode
+json_decoders["json"] = json.loads
+
+def get_decoder(name=None):
+    name = name or os.environ.get("TODO_JSON_DECODER") or next(iter(json_decoders))
+    if name not in json_decoders:
+        raise ValueError(f"JSON decoder {name} is not available, choose from {', '.join(json_decoders)}")
+    return json_decoders[name]
+
+#Transport adapter that counts requests sent and sockets actually opened.
+#With timed=True it also records connect time, time-to-first-byte and a DNS
+#estimate per request.
+class PooledAdapter(HTTPAdapter):
+    def __init__(self, pool_size=10):
+        self.requests_sent = 0
+        self.connections_opened = 0
+        self.timed = False
+        self._lock = threading.Lock()
+        self._timings = threading.local()
+        super().__init__(pool_connections=1, pool_maxsize=pool_size)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        adapter = self
+
+        class CountingHTTPConnection(HTTPConnection):
+            def connect(self):
+                adapter._count("connections_opened")
+                adapter._timed_connect(self.host, self.port, super().connect)
+
+        class CountingHTTPSConnection(HTTPSConnection):
+            def connect(self):
+                adapter._count("connections_opened")
+                adapter._timed_connect(self.host, self.port, super().connect)
+
+        class CountingHTTPPool(HTTPConnectionPool):
+            ConnectionCls = CountingHTTPConnection
+
+        class CountingHTTPSPool(HTTPSConnectionPool):
+            ConnectionCls = CountingHTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": CountingHTTPPool,
+            "https": CountingHTTPSPool,
+        }
+
+    def _count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    #Connections are opened on the thread sending the request, so a thread-local
+    #carries their timings over to the request that triggered them
+    def _timed_connect(self, host, port, connect):
+        if not self.timed:
+            return connect()
+        #urllib3 resolves inside connect() where it can't be timed on its own, so
+        #this is an estimate from a lookup of our own just before. connect
+        #still includes urllib3's real lookup.
+        start = time.perf_counter()
+        try:
+            socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        except OSError:
+            pass
+        resolved = time.perf_counter()
+        connect()
+        self._timings.dns_estimate = resolved - start
+        self._timings.connect = time.perf_counter() - resolved
+
+    def last_timing(self):
+        timings = self._timings
+        return {
+            "dns_estimate": getattr(timings, "dns_estimate", 0.0),
+            "connect": getattr(timings, "connect", 0.0),
+            "ttfb": getattr(timings, "ttfb", 0.0),
+        }
+
+    def send(self, request, **kwargs):
+        self._count("requests_sent")
+        if not self.timed:
+            return super().send(request, **kwargs)
+        self._timings.dns_estimate = self._timings.connect = 0.0
+        start = time.perf_counter()
+        response = super().send(request, **kwargs)
+        #Returns once the status line and headers are in, the body is read later
+        self._timings.ttfb = time.perf_counter() - start
+        return response
+
+#Remembers which todos were created since the server was last known to be empty,
+#so cleanup can delete just those instead of listing and wiping everything.
+#Anything it can't account for (an unreadable POST response, a DELETE of a todo
+#it never saw) drops it back to unknown, and the next cleanup does a full wipe.
+class StateTracker:
+    def __init__(self, decode=None):
+        self.clean = False
+        self.created = set()
+        self.decode = decode or get_decoder()
+        #ResponseCaches of clients sharing this tracker, told about every write
+        self.caches = []
+        self._lock = threading.Lock()
+
+    #Called with every write response (status None if the request failed)
+    def observe(self, method, path, status, content=b"", content_type=""):
+        for cache in self.caches:
+            cache.observe(method, path, status)
+        path = path.split("?", 1)[0].rstrip("/")
+        if method == "POST" and path == "/todos":
+            if status == 201:
+                todo_id = self._created_id(content, content_type)
+                with self._lock:
+                    if todo_id is None:
+                        self.clean = False
+                    else:
+                        self.created.add(todo_id)
+            elif status is None:
+                self.invalidate()
+        elif method == "DELETE" and path.startswith("/todos/") and status in (200, 404):
+            todo_id = path[len("/todos/"):]
+            with self._lock:
+                if status == 200 and todo_id not in self.created:
+                    self.clean = False
+                self.created.discard(todo_id)
+
+    def _created_id(self, content, content_type):
+        try:
+            if "xml" in content_type:
+                return next(iter_xml_todos(content)).id
+            return str(self.decode(content)["id"])
+        except Exception:
+            return None
+
+    def invalidate(self):
+        for cache in self.caches:
+            cache.clear()
+        with self._lock:
+            self.clean = False
+            self.created.clear()
+
+    def mark_clean(self):
+        with self._lock:
+            self.clean = True
+            self.created.clear()
+
+    #Ids to delete to get back to an empty server, or None if a full listing is needed
+    def pending(self):
+        with self._lock:
+            return list(self.created) if self.clean else None
+
+    def is_empty(self):
+        with self._lock:
+            return self.clean and not self.created
+
+#A cached GET response and the validators to revalidate it with
+CacheEntry = namedtuple("CacheEntry", ["response", "etag", "last_modified"])
+
+#Bounded LRU of GET /todos and GET /todos/{id} responses, keyed by path and Accept.
+#Entries stay valid until a write through a client sharing the cache (or its
+#StateTracker) touches them: any write drops the listings, a write to
+#/todos/{id} also drops that todo. Entries with an ETag or Last-Modified are
+#revalidated with a conditional request instead of being trusted outright.
+#mode="verify" always asks the server and counts entries that had gone stale.
+class ResponseCache:
+    cacheable = re.compile(r"^/todos(/[^/]+)?$")
+
+    def __init__(self, maxsize=128, mode="on"):
+        if mode not in ("on", "verify"):
+            raise ValueError(f"Cache mode must be on or verify, not {mode}")
+        self.maxsize = maxsize
+        self.mode = mode
+        self.entries = OrderedDict()
+        #Bumped on every invalidation so a response fetched before a write isn't stored after it
+        self.generation = 0
+        self.counters = {"hits": 0, "revalidated": 0, "misses": 0, "invalidations": 0, "verified": 0, "stale": 0}
+        self._lock = threading.Lock()
+
+    def key(self, path, headers):
+        return path.rstrip("/"), (headers or {}).get("Accept", "")
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, response, generation):
+        entry = CacheEntry(response, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        with self._lock:
+            if generation != self.generation:
+                return
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def observe(self, method, path, status):
+        if method not in ("POST", "PUT", "DELETE"):
+            return
+        path = path.split("?", 1)[0].rstrip("/")
+        with self._lock:
+            self.generation += 1
+            self.counters["invalidations"] += 1
+            for key in [key for key in self.entries if key[0] in ("/todos", path)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self.entries))
+
+#Pooled keep-alive client so every call reuses the same TCP connections.
+#track_state=False turns off the StateTracker, e.g. when something else writes
+#to the same server. cache="on" or "verify" puts a ResponseCache in front of
+#the GET endpoints, request(..., cache=False) bypasses it.
+class TodoClient:
+    def __init__(self, base_url=url, pool_size=10, keep_alive=True, timeout=None, decoder=None, track_state=True,
+                 cache=None, cache_size=128):
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.decode = get_decoder(decoder)
+        self.tracker = StateTracker(self.decode) if track_state else None
+        #Bulk creates may bypass the session on pipelined sockets of their own
+        self.pipelining = True
+        self.cache = ResponseCache(cache_size, "on" if cache is True else cache) if cache else None
+        if self.cache is not None and self.tracker is not None:
+            #Writes made through other clients sharing the tracker invalidate it too
+            self.tracker.caches.append(self.cache)
+
+        self.session = requests.Session()
+        self.adapter = PooledAdapter(pool_size)
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+
+        #Without keep-alive the server closes the socket after every response
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+        #Callables notified with a timing record after every request
+        self.observers = []
+
+    def add_observer(self, observer):
+        self.adapter.timed = True
+        self.observers.append(observer)
+
+    def request(self, method, path, cache=True, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        if method == "GET" and cache and self.cache is not None and self.cache.cacheable.match(path):
+            return self._cached_get(path, **kwargs)
+        if method not in ("POST", "PUT", "DELETE") or (self.tracker is None and self.cache is None):
+            return self._send(method, path, **kwargs)
+        try:
+            response = self._send(method, path, **kwargs)
+        except requests.exceptions.RequestException:
+            self._observe_write(method, path, None)
+            raise
+        self._observe_write(method, path, response.status_code, response.content,
+                            response.headers.get("Content-Type", ""))
+        return response
+
+    def _observe_write(self, method, path, status, content=b"", content_type=""):
+        if self.tracker is not None:
+            self.tracker.observe(method, path, status, content, content_type)
+        elif self.cache is not None:
+            self.cache.observe(method, path, status)
+
+    #Cached responses are shared between callers and already fully read
+    def _cached_get(self, path, headers=None, **kwargs):
+        cache = self.cache
+        key = cache.key(path, headers)
+        entry = cache.get(key)
+        validated = entry is not None and (entry.etag or entry.last_modified)
+        if entry is not None and not validated and cache.mode == "on":
+            cache.count("hits")
+            return entry.response
+
+        headers = dict(headers or {})
+        if validated:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        generation = cache.generation
+        response = self._send("GET", path, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            cache.count("revalidated")
+            return entry.response
+
+        if cache.mode == "verify" and entry is not None:
+            cache.count("verified")
+            if response.status_code != entry.response.status_code or response.content != entry.response.content:
+                cache.count("stale")
+        else:
+            cache.count("misses")
         if response.status_code == 200:
-            return True
-    except requests.exceptions.ConnectionError:
-        return False
+            response.content
+            cache.put(key, response, generation)
+        return response
+
+    def _send(self, method, path, **kwargs):
+        if not self.observers:
+            return self.session.request(method, f"{self.base_url}{path}", **kwargs)
+
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+        except requests.exceptions.RequestException:
+            self._notify(method, path, None, 0, time.perf_counter() - start)
+            raise
+        if kwargs.get("stream"):
+            self._time_body(response, method, path, start)
+        else:
+            self._notify(method, path, response.status_code, len(response.content), time.perf_counter() - start)
+        return response
+
+    #A streamed body is only read after _send returns: report the request once
+    #whoever streams it has read it all (or closed it), with its real size and time
+    def _time_body(self, response, method, path, start):
+        iter_content = response.iter_content
+        close = response.close
+        timing = self.adapter.last_timing()
+        state = {"size": 0, "notified": False}
+
+        def done():
+            if not state["notified"]:
+                state["notified"] = True
+                self._notify(method, path, response.status_code, state["size"], time.perf_counter() - start, timing)
+
+        def timed_content(*args, **kwargs):
+            try:
+                for chunk in iter_content(*args, **kwargs):
+                    state["size"] += len(chunk)
+                    yield chunk
+            finally:
+                done()
+
+        def timed_close():
+            done()
+            close()
+
+        response.iter_content = timed_content
+        response.close = timed_close
+
+    def _notify(self, method, path, status, size, total, timing=None):
+        record = {"method": method, "path": path, "status": status, "bytes": size, "total": total}
+        record.update(timing or self.adapter.last_timing())
+        for observer in self.observers:
+            observer(record)
+
+    #response.json() always goes through the stdlib, these use the client's decoder
+    def decode_json(self, response):
+        return self.decode(response.content)
+
+    def decode_todos(self, response):
+        return decode_todos(response.content, self.decode)
+
+    def list_todos(self, **kwargs):
+        return self.request("GET", "/todos", **kwargs)
+
+    def get_todo(self, todo_id, **kwargs):
+        return self.request("GET", f"/todos/{todo_id}", **kwargs)
 
-def shutdown_server():
+    #Pass the todo as a dict to send JSON, or data=... with headers for XML
+    def create_todo(self, todo=None, **kwargs):
+        if todo is not None:
+            kwargs["json"] = todo
+        return self.request("POST", "/todos", **kwargs)
+
+    def amend_todo(self, todo_id, todo=None, **kwargs):
+        if todo is not None:
+            kwargs["json"] = todo
+        return self.request("POST", f"/todos/{todo_id}", **kwargs)
+
+    def replace_todo(self, todo_id, todo=None, **kwargs):
+        if todo is not None:
+            kwargs["json"] = todo
+        return self.request("PUT", f"/todos/{todo_id}", **kwargs)
+
+    def delete_todo(self, todo_id, **kwargs):
+        return self.request("DELETE", f"/todos/{todo_id}", **kwargs)
+
+    def head_todos(self, todo_id=None, **kwargs):
+        path = "/todos" if todo_id is None else f"/todos/{todo_id}"
+        return self.request("HEAD", path, **kwargs)
+
+    def options_todos(self, todo_id=None, **kwargs):
+        path = "/todos" if todo_id is None else f"/todos/{todo_id}"
+        return self.request("OPTIONS", path, **kwargs)
+
+    def docs(self, **kwargs):
+        return self.request("GET", "/docs", **kwargs)
+
+    def shutdown(self, **kwargs):
+        return self.request("GET", "/shutdown", **kwargs)
+
+    #Count how many requests went over a reused connection versus a new one
+    def connection_stats(self):
+        requests_sent = self.adapter.requests_sent
+        opened = self.adapter.connections_opened
+        return {
+            "requests": requests_sent,
+            "opened": opened,
+            "reused": max(requests_sent - opened, 0),
+        }
+
+    def close(self):
+        self.session.close()
+
+#Compact, immutable todo record. Server dicts and XML elements are normalized into
+#it in one pass: doneStatus becomes a bool and the id a string, whatever the format.
+#Fields every todo the server returns carries. A missing one is a server bug,
+#so it is an error rather than quietly defaulted.
+todo_fields = ("title", "doneStatus", "description")
+
+@dataclass(frozen=True, slots=True)
+class Todo:
+    title: str = ""
+    done_status: bool = False
+    description: str = ""
+    id: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data):
+        missing = [field for field in todo_fields if field not in data]
+        if missing:
+            raise ValueError(f"Todo is missing {', '.join(missing)}: {data}")
+        done_status = data.get("doneStatus", False)
+        if not isinstance(done_status, bool):
+            done_status = str(done_status).lower() == "true"
+        todo_id = data.get("id")
+        return cls(
+            title=data.get("title") or "",
+            done_status=done_status,
+            description=data.get("description") or "",
+            id=None if todo_id is None else str(todo_id),
+        )
+
+    @classmethod
+    def from_xml(cls, element):
+        return cls.from_dict({child.tag: child.text for child in element if len(child) == 0})
+
+    #Same todo without its id, for comparing content across re-posts
+    def without_id(self):
+        return replace(self, id=None)
+
+    #As per documentation, can't post with an ID and doneStatus must be a BOOLEAN
+    def to_payload(self):
+        return {"title": self.title, "doneStatus": self.done_status, "description": self.description}
+
+#Stream todo records out of an XML /todos, /todos/{id} or POST response.
+#Parses incrementally as chunks arrive (use stream=True on the request) and
+#clears each element once its record is built, so memory stays flat.
+def iter_xml_todos(source, chunk_size=16384):
+    if isinstance(source, (bytes, str)):
+        chunks = [source.encode("utf-8") if isinstance(source, str) else source]
+    else:
+        chunks = source.iter_content(chunk_size)
+
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    depth = 0
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                if event == "start":
+                    if root is None:
+                        root = element
+                    depth += 1
+                    continue
+                depth -= 1
+                #A todo is either the document root or a direct child of <todos>
+                if element.tag == "todo" and depth <= 1:
+                    yield Todo.from_xml(element)
+                    element.clear()
+                    if element is not root:
+                        root.remove(element)
+        parser.close()
+    finally:
+        if hasattr(source, "close"):
+            source.close()
+
+def todos_from_xml(content):
+    return list(iter_xml_todos(content))
+
+#Typed decoding of a JSON /todos listing, a GET /todos/{id} or a single POST/PUT
+#response straight into Todo records
+def decode_todos(content, decode=None):
+    data = (decode or get_decoder())(content)
+    todos = data["todos"] if "todos" in data else [data]
+    return [Todo.from_dict(todo) for todo in todos]
+
+#Stable content hash of a todo, the repr of a Todo is already canonical
+def todo_hash(todo, include_id=True):
+    if not include_id:
+        todo = todo.without_id()
+    return hashlib.blake2b(repr(todo).encode("utf-8"), digest_size=16).digest()
+
+StateDiff = namedtuple("StateDiff", ["added", "removed", "modified", "unchanged"])
+
+#Todos indexed by id and by content hash so two states can be diffed in linear time
+class StateSnapshot:
+    def __init__(self, todos):
+        todos = (todo if isinstance(todo, Todo) else Todo.from_dict(todo) for todo in todos)
+        self.todos = {todo.id: todo for todo in todos}
+        self.hashes = {todo_id: todo_hash(todo) for todo_id, todo in self.todos.items()}
+        self.by_hash = {}
+        self._state_hash = None
+        for todo_id, digest in self.hashes.items():
+            self.by_hash.setdefault(digest, set()).add(todo_id)
+
+    @classmethod
+    def from_response(cls, response, decode=None):
+        if "xml" in response.headers.get("Content-Type", ""):
+            return cls(iter_xml_todos(response))
+        return cls(decode_todos(response.content, decode))
+
+    @classmethod
+    def capture(cls, client=None, **kwargs):
+        client = client or get_client()
+        #Only XML is parsed as it streams, JSON is decoded from the whole body anyway
+        kwargs.setdefault("stream", "xml" in (kwargs.get("headers") or {}).get("Accept", ""))
+        #A snapshot is only worth something if it reflects the server, not the cache
+        kwargs.setdefault("cache", False)
+        return cls.from_response(client.list_todos(**kwargs), client.decode)
+
+    #Hash of the whole state ignoring ids, which change whenever todos are re-posted.
+    #Summing the per-todo digests keeps it linear and independent of order.
+    @property
+    def state_hash(self):
+        if self._state_hash is None:
+            total = sum(int.from_bytes(digest, "big") for digest in self.content_hashes())
+            self._state_hash = total % (1 << 128)
+        return self._state_hash
+
+    def content_hashes(self):
+        return [todo_hash(todo, include_id=False) for todo in self.todos.values()]
+
+    def __len__(self):
+        return len(self.todos)
+
+    def __contains__(self, todo):
+        if not isinstance(todo, Todo):
+            todo = Todo.from_dict(todo)
+        return todo_hash(todo) in self.by_hash
+
+    #Ids added, removed, modified or left unchanged going from this snapshot to `current`
+    def diff(self, current):
+        if not isinstance(current, StateSnapshot):
+            current = StateSnapshot(current)
+        before = self.hashes.keys()
+        after = current.hashes.keys()
+        common = before & after
+        modified = {todo_id for todo_id in common if self.hashes[todo_id] != current.hashes[todo_id]}
+        return StateDiff(
+            added=after - before,
+            removed=before - after,
+            modified=modified,
+            unchanged=common - modified,
+        )
+
+#Payload that re-creates a todo captured from the server, as a Todo or a raw dict
+def restorable(todo):
+    if not isinstance(todo, Todo):
+        todo = Todo.from_dict(todo)
+    return todo.to_payload()
+
+#Shared client used by the helpers below and by the test fixtures.
+#TODO_SERVER_URL points it at a server other than localhost:4567.
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = TodoClient(os.environ.get("TODO_SERVER_URL", url))
+    return _client
+
+#Replace the shared client, e.g. once a fake server has picked its port
+def configure_client(base_url, **kwargs):
+    global _client
+    _client = TodoClient(base_url, **kwargs)
+    return _client
+
+#How long check_server_status waits for a server that is still starting up
+ready_timeout = float(os.environ.get("TODO_READY_TIMEOUT", 10))
+
+#Poll GET / until the server answers 200 or `deadline` seconds have passed.
+#Attempts back off exponentially with full jitter, each bounded by `timeout`.
+#`since` is the perf_counter() time the server was started, if known, so the
+#reported time-to-ready covers its whole startup rather than just the polling.
+def wait_for_server(client=None, deadline=None, timeout=2.0, initial_delay=0.05, max_delay=1.0, since=None):
+    client = client or get_client()
+    deadline = ready_timeout if deadline is None else deadline
+    start = time.perf_counter()
+    give_up = start + deadline
+    delay = initial_delay
+    attempts = 0
+    error = None
+
+    while True:
+        attempts += 1
         try:
-            requests.get(url_shutdown)
-            #Server set up where no response is sent and connection error is raised
-            print("Server is running.")
-            return False
-        except requests.exceptions.ConnectionError:
-            print("Server is shut down.")
-            return True
-
-def delete_all_todos():
-    response = requests.get(url_todos)
-    todos = response.json().get('todos', [])  #Get all todos
-
-    #Delete each todo individually
-    for todo in todos:
-        todo_id = todo["id"]
-        delete_response = requests.delete(f"{url_todos}/{todo_id}")
-        assert delete_response.status_code == 200
+            response = client.request("GET", "/", timeout=min(timeout, max(give_up - time.perf_counter(), 0.05)))
+            if response.status_code == 200:
+                ready = True
+                break
+            error = f"GET / answered {response.status_code}"
+        except requests.exceptions.RequestException as exception:
+            error = type(exception).__name__
+
+        remaining = give_up - time.perf_counter()
+        if remaining <= 0:
+            ready = False
+            break
+        time.sleep(min(random.uniform(0, delay), remaining))
+        delay = min(delay * 2, max_delay)
+
+    now = time.perf_counter()
+    result = {
+        "ready": ready,
+        "attempts": attempts,
+        "time_to_ready": now - (start if since is None else since) if ready else None,
+        "waited": now - start,
+        "error": None if ready else error,
+    }
+    return result
+
+def check_server_status(client=None, deadline=None, timeout=2.0):
+    return wait_for_server(client, deadline, timeout)["ready"]
+
+def shutdown_server(client=None):
+    client = client or get_client()
+    try:
+        client.shutdown()
+        #Server set up where no response is sent and connection error is raised
+        print("Server is running.")
+        return False
+    except requests.exceptions.ConnectionError:
+        print("Server is shut down.")
+        return True
+
+#Seed todos over a few persistent, pipelined HTTP/1.1 connections instead of one
+#request-response round trip each. Returns the created ids in the order given,
+#None where the server refused a todo.
+def pipelined_create_todos(todos, client=None, connections=4, depth=64):
+    #async_client builds on this module, so it can only be imported once we're loaded
+    from src import async_client
+    client = client or get_client()
+    responses = async_client.run(async_client.pipeline_seed_todos, list(todos), depth=depth,
+                                 base_url=client.base_url, limit=connections,
+                                 observers=client.observers, tracker=client.tracker)
+    return [str(client.decode(response.content)["id"]) if response.status_code == 201 else None
+            for response in responses]
+
+#Delete one todo and report the failure instead of raising
+def _delete_one(client, todo_id):
+    try:
+        response = client.delete_todo(todo_id)
+    except requests.exceptions.RequestException as error:
+        return todo_id, str(error)
+    if response.status_code != 200:
+        return todo_id, response.status_code
+    return todo_id, None
+
+#List every todo as a raw dict, without a request when the tracker knows the server is empty
+def list_all_todos(client=None):
+    client = client or get_client()
+    if client.tracker is not None and client.tracker.is_empty():
+        return []
+    return client.decode_json(client.list_todos()).get('todos', [])
+
+#Delete every todo, fanning the deletes out over a bounded thread pool.
+#workers defaults to the client's pool size, workers=1 deletes sequentially.
+#When the client's tracker knows what is on the server only those ids are
+#deleted and the listing is skipped.
+#Returns a summary with counts, per-id failures and elapsed time.
+def delete_all_todos(client=None, workers=None, strict=True):
+    client = client or get_client()
+    start = time.perf_counter()
+
+    todo_ids = client.tracker.pending() if client.tracker is not None else None
+    listed = todo_ids is None
+    if listed:
+        response = client.list_todos()
+        todos = client.decode_json(response).get('todos', [])  #Get all todos
+        todo_ids = [todo["id"] for todo in todos]
+
+    if workers is None:
+        workers = client.pool_size
+    workers = max(1, min(workers, len(todo_ids) or 1))
+
+    if workers == 1:
+        results = [_delete_one(client, todo_id) for todo_id in todo_ids]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda todo_id: _delete_one(client, todo_id), todo_ids))
+
+    #A tracked todo that is already gone is as good as deleted
+    failed = {todo_id: error for todo_id, error in results if error is not None and (listed or error != 404)}
+    summary = {
+        "total": len(todo_ids),
+        "deleted": len(todo_ids) - len(failed),
+        "failed": failed,
+        "workers": workers,
+        "listed": listed,
+        "elapsed": time.perf_counter() - start,
+    }
+    if not failed and client.tracker is not None:
+        client.tracker.mark_clean()
+
+    #Every delete is attempted before failing so one bad id doesn't hide the rest
+    if strict:
+        assert not failed, f"Failed to delete todos: {failed}"
+    return summary
+
+#Bring the server back to a captured snapshot with as few writes as possible.
+#Nothing is written when the live state already matches, which is the common
+#case after read-only tests. Otherwise only todos whose content differs are
+#deleted or re-posted, concurrently, and the result is checked with one hash.
+def restore_state(snapshot, client=None, workers=None):
+    client = client or get_client()
+    start = time.perf_counter()
+    live = StateSnapshot.capture(client)
+
+    summary = {"skipped": True, "deleted": 0, "created": 0, "elapsed": 0.0}
+    if live.state_hash == snapshot.state_hash:
+        summary["elapsed"] = time.perf_counter() - start
+        return summary
+
+    #Match todos by content so survivors keep their ids
+    wanted = {}
+    for todo in snapshot.todos.values():
+        wanted.setdefault(todo.without_id(), []).append(todo)
+    to_delete = []
+    for todo_id, todo in live.todos.items():
+        matches = wanted.get(todo.without_id())
+        if matches:
+            matches.pop()
+        else:
+            to_delete.append(todo_id)
+    to_create = [restorable(todo) for matches in wanted.values() for todo in matches]
+
+    if workers is None:
+        workers = client.pool_size
+    workers = max(1, min(workers, len(to_delete) + len(to_create)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        deleted = list(executor.map(lambda todo_id: _delete_one(client, todo_id), to_delete))
+        if client.pipelining:
+            created = [201 if todo_id else 400 for todo_id in pipelined_create_todos(to_create, client, workers)]
+        else:
+            created = [response.status_code
+                       for response in executor.map(lambda todo: client.create_todo(todo), to_create)]
+
+    failed_deletes = {todo_id: error for todo_id, error in deleted if error is not None}
+    failed_creates = [status for status in created if status != 201]
+    assert not failed_deletes, f"Failed to delete todos: {failed_deletes}"
+    assert not failed_creates, f"Failed to re-create todos: {failed_creates}"
+
+    #One hash comparison verifies the whole restore
+    restored = StateSnapshot.capture(client)
+    assert restored.state_hash == snapshot.state_hash, "Restored state does not match the snapshot"
+
+    summary.update({
+        "skipped": False,
+        "deleted": len(to_delete),
+        "created": len(to_create),
+        "elapsed": time.perf_counter() - start,
+    })
+    return summary
 
 def main():
     shutdown_server()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,294 @@
+import argparse
+import itertools
+import json
+import threading
+import xml.etree.ElementTree as ET
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+#In-process stand-in for the todo manager jar, mirroring the quirks the tests document:
+#OPTIONS answers 200, PUT/DELETE on /todos answer 405, doneStatus comes back as a
+#string and numeric titles/descriptions are coerced through float.
+
+todo_fields = ("doneStatus", "description", "title")
+
+class ValidationError(Exception):
+    pass
+
+#Todos are kept in a dict keyed by id so lookups, amends and deletes are O(1)
+class TodoStore:
+    def __init__(self):
+        self.todos = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def list(self):
+        with self.lock:
+            return list(self.todos.values())
+
+    def get(self, todo_id):
+        return self.todos.get(todo_id)
+
+    def create(self, fields):
+        if "title" not in fields:
+            raise ValidationError("title : field is mandatory")
+        with self.lock:
+            todo_id = str(next(self.ids))
+            todo = {"id": todo_id, "title": "", "doneStatus": "false", "description": ""}
+            todo.update(fields)
+            self.todos[todo_id] = todo
+            return todo
+
+    def amend(self, todo_id, fields):
+        with self.lock:
+            todo = self.todos.get(todo_id)
+            if todo is not None:
+                todo.update(fields)
+            return todo
+
+    def replace(self, todo_id, fields):
+        if "title" not in fields:
+            raise ValidationError("title : field is mandatory")
+        with self.lock:
+            if todo_id not in self.todos:
+                return None
+            todo = {"id": todo_id, "title": "", "doneStatus": "false", "description": ""}
+            todo.update(fields)
+            self.todos[todo_id] = todo
+            return todo
+
+    def delete(self, todo_id):
+        with self.lock:
+            return self.todos.pop(todo_id, None)
+
+#Coerce payload values the way the real server stores them
+def normalize_fields(payload, from_xml=False):
+    if not isinstance(payload, dict):
+        raise ValidationError("Failed Validation: todo should be an object")
+    if "id" in payload:
+        raise ValidationError("Invalid Creation: Failed Validation: Not allowed to create with id")
+
+    fields = {}
+    for key, value in payload.items():
+        if key not in todo_fields:
+            raise ValidationError(f"Could not find field: {key}")
+        if key == "doneStatus":
+            if from_xml and isinstance(value, str) and value.lower() in ("true", "false"):
+                value = value.lower() == "true"
+            if not isinstance(value, bool):
+                raise ValidationError("Failed Validation: doneStatus should be BOOLEAN")
+            fields[key] = "true" if value else "false"
+        elif isinstance(value, bool):
+            fields[key] = "true" if value else "false"
+        elif isinstance(value, (int, float)):
+            fields[key] = str(float(value))
+        elif value is None:
+            fields[key] = ""
+        elif isinstance(value, str):
+            fields[key] = value
+        else:
+            raise ValidationError(f"Failed Validation: {key} should be STRING")
+
+    if "title" in fields and fields["title"] == "":
+        raise ValidationError("Failed Validation: title : can not be empty")
+    return fields
+
+def todo_to_xml(todo):
+    element = ET.Element("todo")
+    for key in sorted(todo):
+        ET.SubElement(element, key).text = todo[key]
+    return element
+
+class FakeTodoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def version_string(self):
+        return "Jetty(fake-todo-manager)"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def store(self):
+        return self.server.store
+
+    def wants_xml(self):
+        accept = self.headers.get("Accept", "")
+        if "application/xml" not in accept:
+            return False
+        return "application/json" not in accept or accept.index("application/xml") < accept.index("application/json")
+
+    def send_body(self, status, body=b"", content_type=None, extra_headers=None):
+        self.send_response(status)
+        if content_type is None:
+            content_type = "application/xml" if self.wants_xml() else "application/json"
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        if self.headers.get("Connection", "").lower() == "close":
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+
+        #Single chunk plus terminator, written in one go
+        if self.command != "HEAD":
+            chunk = b"%x\r\n%s\r\n" % (len(body), body) if body else b""
+            self.wfile.write(chunk + b"0\r\n\r\n")
+
+    def send_todos(self, status, todos):
+        if self.wants_xml():
+            root = ET.Element("todos")
+            root.extend(todo_to_xml(todo) for todo in todos)
+            self.send_body(status, ET.tostring(root))
+        else:
+            self.send_body(status, json.dumps({"todos": todos}).encode("utf-8"))
+
+    def send_todo(self, status, todo):
+        if self.wants_xml():
+            self.send_body(status, ET.tostring(todo_to_xml(todo)))
+        else:
+            self.send_body(status, json.dumps(todo).encode("utf-8"))
+
+    def send_error_messages(self, status, *messages):
+        if self.wants_xml():
+            root = ET.Element("errorMessages")
+            for message in messages:
+                ET.SubElement(root, "errorMessage").text = message
+            self.send_body(status, ET.tostring(root))
+        else:
+            self.send_body(status, json.dumps({"errorMessages": list(messages)}).encode("utf-8"))
+
+    def read_payload(self):
+        raw = self.body
+        content_type = self.headers.get("Content-Type", "")
+
+        if "xml" in content_type:
+            try:
+                root = ET.fromstring(raw)
+            except ET.ParseError:
+                raise ValidationError("Could not parse the XML payload")
+            payload = {child.tag: child.text or "" for child in root}
+            return normalize_fields(payload, from_xml=True)
+
+        try:
+            payload = json.loads(raw or b"{}")
+        except ValueError:
+            raise ValidationError("Could not parse the JSON payload")
+        return normalize_fields(payload)
+
+    def route(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        parts = path.strip("/").split("/") if path else []
+        if parts and parts[0] == "todos" and len(parts) <= 2:
+            return "todos", parts[1] if len(parts) == 2 else None
+        return path or "/", None
+
+    def handle_method(self):
+        #Always drain the body so unsupported requests don't corrupt a keep-alive connection
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length) if length else b""
+        route, todo_id = self.route()
+
+        if route == "/shutdown":
+            #Like the real server, stop without sending a response
+            self.close_connection = True
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+        if route in ("/", "/docs"):
+            if self.command not in ("GET", "HEAD"):
+                return self.send_body(405, content_type="text/html")
+            page = b"<html><body><h1>Fake todo manager</h1></body></html>"
+            return self.send_body(200, page, content_type="text/html")
+        if route != "todos":
+            return self.send_error_messages(404, f"Could not find endpoint {self.path}")
+
+        if self.command == "OPTIONS":
+            allow = "OPTIONS, GET, HEAD, POST" if todo_id is None else "OPTIONS, GET, HEAD, POST, PUT, DELETE"
+            return self.send_body(200, extra_headers={"Allow": allow})
+        if todo_id is None:
+            return self.handle_collection()
+        return self.handle_instance(todo_id)
+
+    def handle_collection(self):
+        if self.command in ("GET", "HEAD"):
+            return self.send_todos(200, self.store.list())
+        if self.command == "POST":
+            try:
+                todo = self.store.create(self.read_payload())
+            except ValidationError as error:
+                return self.send_error_messages(400, str(error))
+            return self.send_todo(201, todo)
+        return self.send_body(405)
+
+    def handle_instance(self, todo_id):
+        if self.command in ("GET", "HEAD"):
+            todo = self.store.get(todo_id)
+            if todo is None:
+                return self.send_error_messages(404, f"Could not find an instance with todos/{todo_id}")
+            return self.send_todos(200, [todo])
+        if self.command in ("POST", "PUT"):
+            try:
+                fields = self.read_payload()
+                if self.command == "POST":
+                    todo = self.store.amend(todo_id, fields)
+                else:
+                    todo = self.store.replace(todo_id, fields)
+            except ValidationError as error:
+                return self.send_error_messages(400, str(error))
+            if todo is None:
+                return self.send_error_messages(404, f"No such todo entity instance with GUID or ID {todo_id} found")
+            return self.send_todo(200, todo)
+        if self.command == "DELETE":
+            if self.store.delete(todo_id) is None:
+                return self.send_error_messages(404, f"Could not find any instances with todos/{todo_id}")
+            return self.send_body(200)
+        return self.send_body(405)
+
+    do_GET = do_HEAD = do_POST = do_PUT = do_DELETE = do_OPTIONS = do_PATCH = handle_method
+
+class FakeTodoServer(ThreadingHTTPServer):
+    daemon_threads = True
+    #Pipelined seeding and the benchmarks open dozens of connections at once,
+    #the default backlog of 5 resets some of them
+    request_queue_size = 1024
+
+    def __init__(self, host="127.0.0.1", port=0):
+        super().__init__((host, port), FakeTodoHandler)
+        self.store = TodoStore()
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        #shutdown() waits for the next poll, the default 0.5s would dominate short sessions
+        self.thread = threading.Thread(target=self.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+#Start a fake server on an ephemeral port in a background thread
+def start_fake_server(host="127.0.0.1", port=0):
+    return FakeTodoServer(host, port).start()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake todo manager server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4567)
+    args = parser.parse_args()
+
+    server = FakeTodoServer(args.host, args.port)
+    print(f"Fake todo manager listening on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import json
+import random
+from xml.sax.saxutils import escape
+
+#Generated POST/PUT payloads for the fuzz benchmark. Every case knows which
+#statuses the documentation promises and which the server actually returns
+#(the quirks test_todos_actual_behavior_working.py pins down), so responses can
+#be classified as documented, actual-but-undocumented or unexpected.
+
+json_headers = {"Accept": "application/json", "Content-Type": "application/json"}
+xml_headers = {"Accept": "application/xml", "Content-Type": "application/xml"}
+
+unicode_samples = [
+    "café crème", "日本語のタイトル", "مرحبا",
+    "\U0001f600\U0001f680\U0001f44d", "é́́", "​zero​width", "tab\tnew\nline",
+]
+
+class FuzzCase:
+    def __init__(self, kind, content_type, body, documented, actual=None):
+        self.kind = kind
+        self.content_type = content_type
+        self.body = body if isinstance(body, bytes) else body.encode("utf-8")
+        self.documented = documented
+        self.actual = actual or documented
+
+    @property
+    def headers(self):
+        return xml_headers if self.content_type == "xml" else json_headers
+
+    #documented, actual (a known quirk) or unexpected
+    def classify(self, status):
+        if status in self.documented:
+            return "documented"
+        if status in self.actual:
+            return "actual"
+        return "unexpected"
+
+def random_text(rng, low=1, high=40):
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz ") for _ in range(rng.randint(low, high))).strip() or "x"
+
+def to_json(todo):
+    return json.dumps(todo, ensure_ascii=False)
+
+#Field values are rendered with str(), booleans in lower case
+def to_xml(todo):
+    fields = "".join(
+        f"<{key}>{escape(str(value).lower() if isinstance(value, bool) else str(value))}</{key}>"
+        for key, value in todo.items()
+    )
+    return f"<todo>{fields}</todo>"
+
+def valid_todo(rng):
+    return {"title": random_text(rng), "doneStatus": rng.random() < 0.5, "description": random_text(rng, 0, 80)}
+
+#Each generator returns (todo fields or raw body, documented statuses, actual statuses).
+#ok is the success status of the method being fuzzed: 201 for POST, 200 for PUT.
+def gen_valid(rng, ok, max_size):
+    return valid_todo(rng), {ok}, None
+
+def gen_unicode(rng, ok, max_size):
+    todo = valid_todo(rng)
+    todo["title"] = rng.choice(unicode_samples) + " " + random_text(rng, 1, 10)
+    todo["description"] = "".join(rng.choice(unicode_samples) for _ in range(rng.randint(1, 5)))
+    return todo, {ok}, None
+
+def gen_huge_title(rng, ok, max_size):
+    todo = valid_todo(rng)
+    todo["title"] = "T" * rng.randint(1024, max(1024, max_size))
+    return todo, {ok}, None
+
+#Documentation says description is a STRING, the server stores str(float(value))
+def gen_numeric_description(rng, ok, max_size):
+    todo = valid_todo(rng)
+    todo["description"] = rng.choice([rng.randint(-10 ** 9, 10 ** 9), rng.uniform(-1e6, 1e6), 0])
+    return todo, {400}, {ok}
+
+def gen_string_done_status(rng, ok, max_size):
+    todo = valid_todo(rng)
+    todo["doneStatus"] = rng.choice(["true", "false", "yes", "1", ""])
+    return todo, {400}, None
+
+def gen_missing_title(rng, ok, max_size):
+    todo = valid_todo(rng)
+    del todo["title"]
+    return todo, {400}, None
+
+def gen_empty_title(rng, ok, max_size):
+    todo = valid_todo(rng)
+    todo["title"] = ""
+    return todo, {400}, None
+
+def gen_unknown_field(rng, ok, max_size):
+    todo = valid_todo(rng)
+    todo[random_text(rng, 3, 12).replace(" ", "_") or "extra"] = random_text(rng)
+    return todo, {400}, None
+
+def gen_with_id(rng, ok, max_size):
+    todo = valid_todo(rng)
+    todo["id"] = str(rng.randint(1, 10 ** 6))
+    return todo, {400}, None
+
+def gen_deep_nesting(rng, ok, max_size):
+    todo = valid_todo(rng)
+    depth = rng.randint(10, 200)
+    nested = "leaf"
+    for _ in range(depth):
+        nested = {"n": nested}
+    todo["description"] = nested
+    return todo, {400}, None
+
+def gen_oversized_body(rng, ok, max_size):
+    todo = valid_todo(rng)
+    todo["description"] = random_text(rng, 10, 10) * max(1, (max_size * 4) // 10)
+    return todo, {ok, 413}, None
+
+def gen_malformed(rng, ok, max_size):
+    return None, {400}, None
+
+generators = {
+    "valid": (gen_valid, 6),
+    "unicode": (gen_unicode, 2),
+    "huge_title": (gen_huge_title, 1),
+    "numeric_description": (gen_numeric_description, 1),
+    "string_done_status": (gen_string_done_status, 1),
+    "missing_title": (gen_missing_title, 1),
+    "empty_title": (gen_empty_title, 1),
+    "unknown_field": (gen_unknown_field, 1),
+    "with_id": (gen_with_id, 1),
+    "deep_nesting": (gen_deep_nesting, 1),
+    "oversized_body": (gen_oversized_body, 0.2),
+    "malformed": (gen_malformed, 1),
+}
+
+#Truncated, unbalanced or non-document bodies in either format
+def malformed_body(rng, content_type):
+    document = to_xml(valid_todo(rng)) if content_type == "xml" else to_json(valid_todo(rng))
+    variants = [
+        document[:rng.randint(1, len(document) - 1)],
+        document.replace(">", "", 1) if content_type == "xml" else document.replace(":", "", 1),
+        "<todo><title>x</todo></title>" if content_type == "xml" else "{'title': 'single quotes'}",
+        "\x00\x01\x02 binary junk",
+        "",
+    ]
+    return rng.choice(variants)
+
+#XML can't express nested objects or numbers, those cases become nested elements
+#and plain text, which the server treats as a STRING
+def render(rng, todo, content_type):
+    if content_type == "json":
+        return to_json(todo)
+    if isinstance(todo.get("description"), dict):
+        depth = 0
+        nested = todo["description"]
+        while isinstance(nested, dict):
+            nested = nested["n"]
+            depth += 1
+        fields = {key: value for key, value in todo.items() if key != "description"}
+        return to_xml(fields).replace("</todo>", "<description>" + "<n>" * depth + "leaf" + "</n>" * depth
+                                      + "</description></todo>")
+    return to_xml(todo)
+
+def generate_case(rng, method, content_type, max_size, kinds=None):
+    kinds = kinds or list(generators)
+    kind = rng.choices(kinds, [generators[name][1] for name in kinds])[0]
+    ok = 201 if method == "POST" else 200
+    todo, documented, actual = generators[kind][0](rng, ok, max_size)
+    if kind == "malformed":
+        body = malformed_body(rng, content_type)
+    else:
+        body = render(rng, todo, content_type)
+        if content_type == "xml" and kind in ("numeric_description", "string_done_status"):
+            #Everything is text in XML: a number is a fine STRING and "yes"/"1" are still invalid
+            if kind == "numeric_description":
+                documented, actual = {ok}, None
+            elif str(todo["doneStatus"]).lower() in ("true", "false"):
+                documented, actual = {ok}, None
+    return FuzzCase(kind, content_type, body, documented, actual)
+
+def generate_cases(count, methods=("POST", "PUT"), formats=("json", "xml"), max_size=65536, seed=0, kinds=None):
+    rng = random.Random(seed)
+    cases = []
+    for _ in range(count):
+        method = rng.choice(methods)
+        cases.append((method, generate_case(rng, method, rng.choice(formats), max_size, kinds)))
+    return cases
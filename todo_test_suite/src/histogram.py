@@ -0,0 +1,90 @@
+import math
+
+#HDR-style latency histogram: values are recorded in whole microseconds into
+#log-linear buckets, exact below 2 * 10^digits and within 10^-digits relative
+#error above that, so percentiles stay accurate whatever the range of values
+#while the memory used only grows with the number of distinct buckets hit.
+
+#Nearest-rank percentile of an already sorted list of exact values
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class LatencyHistogram:
+    def __init__(self, significant_digits=3):
+        self.significant_digits = significant_digits
+        #Smallest power of two that can tell apart 10^digits values in one octave
+        self.sub_bucket_bits = math.ceil(math.log2(2 * 10 ** significant_digits))
+        self.sub_bucket_count = 1 << self.sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count >> 1
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = 0
+
+    def bucket_for(self, value):
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return self.sub_bucket_count + (shift - 1) * self.sub_bucket_half + (value >> shift) - self.sub_bucket_half
+
+    #Largest value that lands in the bucket
+    def value_for(self, bucket):
+        if bucket < self.sub_bucket_count:
+            return bucket
+        shift, sub_bucket = divmod(bucket - self.sub_bucket_count, self.sub_bucket_half)
+        shift += 1
+        return ((sub_bucket + self.sub_bucket_half + 1) << shift) - 1
+
+    #Latency in seconds
+    def record(self, seconds, count=1):
+        value = max(0, int(round(seconds * 1e6)))
+        bucket = self.bucket_for(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    #Nearest-rank percentile in milliseconds
+    def percentile(self, q):
+        if not self.total:
+            return 0.0
+        rank = max(1, math.ceil(q / 100 * self.total))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self.value_for(bucket), self.max) / 1000
+        return self.max / 1000
+
+    def mean(self):
+        return self.sum / self.total / 1000 if self.total else 0.0
+
+    def summary(self):
+        return {
+            "count": self.total,
+            "mean_ms": self.mean(),
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "p999_ms": self.percentile(99.9),
+            "max_ms": self.max / 1000,
+        }
+
+    #Fold another histogram (e.g. from a worker process) into this one. Exact,
+    #since histograms with the same precision share bucket boundaries.
+    def merge(self, other):
+        if other.significant_digits != self.significant_digits:
+            raise ValueError("Can only merge histograms recorded with the same significant digits")
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.total += other.total
+        self.sum += other.sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
@@ -0,0 +1,205 @@
+import json
+import re
+import threading
+import time
+import pytest
+
+from src.histogram import percentile
+
+#Collects the timing records TodoClient/AsyncTodoClient observers emit and tags
+#each one with the test, phase and fixture that was running when it was made.
+
+id_segment = re.compile(r"^/todos/[^/?]+")
+
+#Group /todos/12 and /todos/57 under one endpoint
+def endpoint_path(path):
+    return id_segment.sub("/todos/{id}", path)
+
+class RequestRecorder:
+    def __init__(self):
+        self.records = []
+        self.context = {"test": None, "phase": None, "fixture": None}
+        self.phase_durations = {"setup": 0.0, "call": 0.0, "teardown": 0.0}
+        self.fixture_durations = {}
+        #Extra session-wide measurements, e.g. server time-to-ready
+        self.metrics = {}
+        #Called at every test phase boundary while the old context is still set,
+        #e.g. to take a resource sample that covers exactly the phase that ended
+        self.phase_listeners = []
+        self._lock = threading.Lock()
+        self._teardown_mark = 0
+        self._teardown_clock = None
+
+    #Observer passed to the clients
+    def record(self, record):
+        record = dict(record, **self.context)
+        with self._lock:
+            self.records.append(record)
+
+    def enter_phase(self, test, phase):
+        for listener in self.phase_listeners:
+            listener()
+        self.context.update(test=test, phase=phase, fixture=None)
+        if phase == "teardown":
+            self._teardown_mark = len(self.records)
+            self._teardown_clock = time.perf_counter()
+
+    def leave_phase(self):
+        for listener in self.phase_listeners:
+            listener()
+        self.context.update(test=None, phase=None, fixture=None)
+        self._teardown_clock = None
+
+    def add_phase_duration(self, phase, duration):
+        self.phase_durations[phase] = self.phase_durations.get(phase, 0.0) + duration
+
+    def add_fixture_duration(self, fixture, duration):
+        self.fixture_durations[fixture] = self.fixture_durations.get(fixture, 0.0) + duration
+
+    #Called once a fixture's finalizers have run: everything recorded since the
+    #previous fixture finished tearing down belongs to this one
+    def fixture_finished(self, fixture):
+        with self._lock:
+            for record in self.records[self._teardown_mark:]:
+                if record["phase"] == "teardown" and record["fixture"] is None:
+                    record["fixture"] = fixture
+            self._teardown_mark = len(self.records)
+        if self._teardown_clock is not None:
+            now = time.perf_counter()
+            self.add_fixture_duration(fixture, now - self._teardown_clock)
+            self._teardown_clock = now
+
+    def endpoint_summary(self):
+        groups = {}
+        for record in self.records:
+            groups.setdefault(f"{record['method']} {endpoint_path(record['path'])}", []).append(record)
+        summary = {}
+        for key, records in groups.items():
+            totals = sorted(record["total"] for record in records)
+            summary[key] = {
+                "count": len(records),
+                "total_s": sum(totals),
+                "mean_ms": sum(totals) / len(totals) * 1000,
+                "p95_ms": percentile(totals, 95) * 1000,
+                "max_ms": totals[-1] * 1000,
+                "ttfb_mean_ms": sum(record["ttfb"] for record in records) / len(records) * 1000,
+                "connect_s": sum(record["connect"] for record in records),
+                "dns_estimate_s": sum(record["dns_estimate"] for record in records),
+                "bytes": sum(record["bytes"] for record in records),
+            }
+        return summary
+
+    def fixture_summary(self):
+        http_time = {}
+        requests_made = {}
+        for record in self.records:
+            if record["fixture"]:
+                http_time[record["fixture"]] = http_time.get(record["fixture"], 0.0) + record["total"]
+                requests_made[record["fixture"]] = requests_made.get(record["fixture"], 0) + 1
+        names = set(self.fixture_durations) | set(http_time)
+        return {
+            name: {
+                "wall_s": self.fixture_durations.get(name, 0.0),
+                "http_s": http_time.get(name, 0.0),
+                "requests": requests_made.get(name, 0),
+            }
+            for name in names
+        }
+
+    def phase_summary(self):
+        http_time = {}
+        for record in self.records:
+            if record["phase"]:
+                http_time[record["phase"]] = http_time.get(record["phase"], 0.0) + record["total"]
+        return {
+            phase: {"wall_s": duration, "http_s": http_time.get(phase, 0.0)}
+            for phase, duration in self.phase_durations.items()
+        }
+
+    def report(self):
+        return {
+            "requests": len(self.records),
+            "endpoints": self.endpoint_summary(),
+            "fixtures": self.fixture_summary(),
+            "phases": self.phase_summary(),
+            "metrics": self.metrics,
+        }
+
+    def report_lines(self, top=5):
+        report = self.report()
+        lines = [f"{report['requests']} requests recorded", "slowest endpoints (by total time):"]
+        endpoints = sorted(report["endpoints"].items(), key=lambda item: item[1]["total_s"], reverse=True)
+        for key, row in endpoints[:top]:
+            lines.append(f"  {key:<24} n={row['count']:<5} total={row['total_s'] * 1000:8.1f}ms "
+                         f"mean={row['mean_ms']:6.2f}ms p95={row['p95_ms']:6.2f}ms max={row['max_ms']:6.2f}ms")
+
+        lines.append("slowest fixtures (setup + teardown wall time):")
+        fixtures = sorted(report["fixtures"].items(), key=lambda item: item[1]["wall_s"], reverse=True)
+        for name, row in fixtures[:top]:
+            lines.append(f"  {name:<24} wall={row['wall_s'] * 1000:8.1f}ms http={row['http_s'] * 1000:8.1f}ms "
+                         f"requests={row['requests']}")
+
+        lines.append("time by phase:")
+        for phase, row in report["phases"].items():
+            lines.append(f"  {phase:<24} wall={row['wall_s'] * 1000:8.1f}ms http={row['http_s'] * 1000:8.1f}ms")
+        return lines
+
+    #Under pytest-xdist every worker records its own requests. Workers export
+    #what they saw at the end of the session and the controller absorbs it.
+    #Phase durations aren't exported: the controller already gets every test
+    #report through pytest_runtest_logreport.
+    def export(self):
+        return {
+            "records": self.records,
+            "fixture_durations": self.fixture_durations,
+            "metrics": self.metrics,
+        }
+
+    def absorb(self, exported):
+        with self._lock:
+            self.records.extend(exported["records"])
+        for fixture, duration in exported["fixture_durations"].items():
+            self.add_fixture_duration(fixture, duration)
+        self.metrics.setdefault("workers", []).append(exported["metrics"])
+
+    def write(self, path):
+        with open(path, "w") as output:
+            json.dump({"summary": self.report(), "records": self.records}, output, indent=2)
+
+#pytest hooks feeding a RequestRecorder with the running test, phase and fixture
+class RequestTimingPlugin:
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_setup(self, item):
+        self.recorder.enter_phase(item.nodeid, "setup")
+        yield
+        self.recorder.leave_phase()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_call(self, item):
+        self.recorder.enter_phase(item.nodeid, "call")
+        yield
+        self.recorder.leave_phase()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_teardown(self, item):
+        self.recorder.enter_phase(item.nodeid, "teardown")
+        yield
+        self.recorder.leave_phase()
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_fixture_setup(self, fixturedef):
+        previous = self.recorder.context["fixture"]
+        self.recorder.context["fixture"] = fixturedef.argname
+        start = time.perf_counter()
+        yield
+        self.recorder.add_fixture_duration(fixturedef.argname, time.perf_counter() - start)
+        self.recorder.context["fixture"] = previous
+
+    def pytest_fixture_post_finalizer(self, fixturedef):
+        self.recorder.fixture_finished(fixturedef.argname)
+
+    def pytest_runtest_logreport(self, report):
+        self.recorder.add_phase_duration(report.when, report.duration)
@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import json
+import os
+import shlex
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.commands import TodoClient, shutdown_server, wait_for_server
+
+#Launches the server under test, or reuses a warm one left running by an earlier
+#session. The command may contain a {port} placeholder, e.g.
+#   TODO_SERVER_CMD="java -jar runTodoManagerRestAPI-1.5.5.jar -port={port}"
+#   TODO_SERVER_CMD="python -m src.fake_server --port {port}"
+#Without one the server is expected on --port (4567 by default).
+#   python -m src.lifecycle start|status|stop
+
+default_port = 4567
+
+#One lock file per command (and per xdist worker), holding the PID and port
+def lock_path_for(command, instance=""):
+    digest = hashlib.blake2b(f"{command}|{instance}".encode("utf-8"), digest_size=6).hexdigest()
+    return os.path.join(tempfile.gettempdir(), f"todo-server-{digest}.json")
+
+def free_port(host="127.0.0.1"):
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+#Whether something is already listening on the port, e.g. another worker's server
+def port_in_use(host, port):
+    with socket.socket() as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind((host, port))
+        except OSError:
+            return True
+    return False
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class ManagedServer:
+    def __init__(self, command, port=None, host="127.0.0.1", lock_path=None, ready_timeout=60.0, instance=""):
+        self.command = command
+        self.host = host
+        self.has_port_placeholder = "{port}" in command
+        #Ephemeral port when the command takes one, otherwise wherever the server listens
+        self.port = port if port is not None else (0 if self.has_port_placeholder else default_port)
+        self.lock_path = lock_path or lock_path_for(command, instance)
+        self.log_path = os.path.splitext(self.lock_path)[0] + ".log"
+        self.ready_timeout = ready_timeout
+        self.pid = None
+        self.reused = False
+        self.readiness = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def client(self):
+        return TodoClient(self.url, track_state=False)
+
+    def read_lock(self):
+        try:
+            with open(self.lock_path) as lock:
+                return json.load(lock)
+        except (OSError, ValueError):
+            return None
+
+    def write_lock(self):
+        info = {"pid": self.pid, "port": self.port, "host": self.host, "command": self.command, "started": time.time()}
+        #Write then rename so a concurrent reader never sees half a file
+        partial = f"{self.lock_path}.{os.getpid()}"
+        with open(partial, "w") as lock:
+            json.dump(info, lock)
+        os.replace(partial, self.lock_path)
+
+    def remove_lock(self):
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+    #A recorded instance is healthy if its process is still there and answers GET /
+    #within `timeout`, so a busy but warm server is not mistaken for a dead one
+    def healthy(self, info, timeout=2.0):
+        if not info or info.get("command") != self.command or not pid_alive(info["pid"]):
+            return False
+        client = TodoClient(f"http://{info['host']}:{info['port']}", track_state=False)
+        try:
+            return wait_for_server(client, deadline=timeout, timeout=timeout)["ready"]
+        finally:
+            client.close()
+
+    #Reuse the warm instance from the lock file if it is healthy, otherwise launch one
+    def start(self):
+        info = self.read_lock()
+        if self.healthy(info):
+            self.pid, self.host, self.port = info["pid"], info["host"], info["port"]
+            self.reused = True
+            return self
+        if info and pid_alive(info["pid"]) and info.get("command") == self.command:
+            #Still running but not answering, don't leave it holding the port
+            self.terminate(info["pid"])
+        self.remove_lock()
+
+        if self.has_port_placeholder and not self.port:
+            self.port = free_port(self.host)
+        elif port_in_use(self.host, self.port):
+            #A server we didn't launch would answer the readiness check in place of ours
+            raise RuntimeError(f"Port {self.port} is already in use by a server without a lock file here")
+        args = [part.format(port=self.port) for part in shlex.split(self.command)]
+        started = time.perf_counter()
+        with open(self.log_path, "ab") as log:
+            #New session so the server outlives this test run and can be reused
+            process = subprocess.Popen(args, stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                       start_new_session=True)
+        self.pid = process.pid
+
+        client = self.client()
+        try:
+            self.readiness = wait_for_server(client, deadline=self.ready_timeout, since=started)
+        finally:
+            client.close()
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode} during startup, see {self.log_path}")
+        if not self.readiness["ready"]:
+            self.terminate(self.pid)
+            raise RuntimeError(f"Server did not become ready within {self.ready_timeout}s "
+                               f"({self.readiness['error']}), see {self.log_path}")
+        self.write_lock()
+        return self
+
+    #Ask the server to shut down through /shutdown, falling back to signals
+    def stop(self, timeout=10.0):
+        info = self.read_lock()
+        if info:
+            self.pid, self.host, self.port = info["pid"], info["host"], info["port"]
+        if self.pid is None:
+            return False
+
+        client = self.client()
+        try:
+            shutdown_server(client)
+        finally:
+            client.close()
+        if not self.wait_exit(self.pid, timeout):
+            self.terminate(self.pid, timeout)
+        self.remove_lock()
+        return True
+
+    def wait_exit(self, pid, timeout):
+        give_up = time.perf_counter() + timeout
+        while time.perf_counter() < give_up:
+            try:
+                #Reap it if it is our child, otherwise just check it is gone
+                if os.waitpid(pid, os.WNOHANG)[0] == pid:
+                    return True
+            except ChildProcessError:
+                if not pid_alive(pid):
+                    return True
+            time.sleep(0.05)
+        return False
+
+    def terminate(self, pid, timeout=5.0):
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            try:
+                os.kill(pid, sig)
+            except ProcessLookupError:
+                return
+            if self.wait_exit(pid, timeout):
+                return
+
+    def status(self):
+        info = self.read_lock()
+        return {"lock": self.lock_path, "running": self.healthy(info), **(info or {})}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Start, reuse or stop the todo manager server")
+    parser.add_argument("--cmd", default=os.environ.get("TODO_SERVER_CMD"), help="Server command, may contain {port}")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("action", choices=("start", "status", "stop"))
+    args = parser.parse_args(argv)
+    if not args.cmd:
+        parser.error("--cmd or TODO_SERVER_CMD is required")
+
+    server = ManagedServer(args.cmd, port=args.port)
+    if args.action == "start":
+        server.start()
+        how = "reused" if server.reused else f"started in {server.readiness['time_to_ready'] * 1000:.0f}ms"
+        print(f"Server {how} at {server.url} (pid {server.pid})")
+    elif args.action == "stop":
+        print("Server stopped." if server.stop() else "No managed server running.")
+    else:
+        print(json.dumps(server.status(), indent=2))
+
+if __name__ == "__main__":
+    main()
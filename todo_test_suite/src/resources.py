@@ -0,0 +1,229 @@
+import gc
+import os
+import threading
+import time
+
+#Samples the server process's CPU, memory, threads, context switches and I/O
+#from /proc while tests or benchmarks run, tagging each sample with whatever the
+#context callable says is running (test and phase, benchmark phase, ...).
+#Linux only: elsewhere find_listening_pid returns None and sampling is skipped.
+
+clock_ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+megabyte = 1024 * 1024
+
+def _listening_inodes(port):
+    inodes = set()
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table) as source:
+                next(source)
+                for line in source:
+                    fields = line.split()
+                    #local_address is HEXIP:HEXPORT, state 0A is LISTEN
+                    if int(fields[1].rsplit(":", 1)[1], 16) == port and fields[3] == "0A":
+                        inodes.add(fields[9])
+        except OSError:
+            continue
+    return inodes
+
+#PID of the process listening on `port`, or None if it can't be found (or isn't ours to see)
+def find_listening_pid(port):
+    inodes = _listening_inodes(port)
+    if not inodes:
+        return None
+    targets = {f"socket:[{inode}]" for inode in inodes}
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            for fd in os.listdir(f"/proc/{pid}/fd"):
+                if os.readlink(f"/proc/{pid}/fd/{fd}") in targets:
+                    return int(pid)
+        except OSError:
+            continue
+    return None
+
+def _read_fields(path):
+    fields = {}
+    try:
+        with open(path) as source:
+            for line in source:
+                key, _, value = line.partition(":")
+                fields[key.strip()] = value.split()
+    except OSError:
+        pass
+    return fields
+
+#One reading of /proc/<pid>/stat, status and io. Raises OSError once the process is gone.
+def read_proc(pid):
+    with open(f"/proc/{pid}/stat") as source:
+        #The command name may contain spaces and parentheses, the fields after it don't
+        stat = source.read().rsplit(")", 1)[1].split()
+    status = _read_fields(f"/proc/{pid}/status")
+    #io needs ptrace access to the process, leave it out if we don't have it.
+    #rchar/wchar count every read()/write() including sockets, not just disk I/O
+    io = _read_fields(f"/proc/{pid}/io")
+    return {
+        "cpu_s": (int(stat[11]) + int(stat[12])) / clock_ticks,
+        "threads": int(stat[17]),
+        "rss_bytes": int(stat[21]) * page_size,
+        "peak_rss_bytes": int(status.get("VmHWM", ["0"])[0]) * 1024,
+        "ctx_switches": int(status.get("voluntary_ctxt_switches", ["0"])[0]) +
+                        int(status.get("nonvoluntary_ctxt_switches", ["0"])[0]),
+        "rchar": int(io.get("rchar", ["0"])[0]),
+        "wchar": int(io.get("wchar", ["0"])[0]),
+    }
+
+#Least-squares slope (per second) and r^2 of values over time
+def _trend(points):
+    if len(points) < 3:
+        return 0.0, 0.0
+    mean_t = sum(t for t, _ in points) / len(points)
+    mean_v = sum(v for _, v in points) / len(points)
+    spread_t = sum((t - mean_t) ** 2 for t, _ in points)
+    spread_v = sum((v - mean_v) ** 2 for _, v in points)
+    if spread_t == 0 or spread_v == 0:
+        return 0.0, 0.0
+    covariance = sum((t - mean_t) * (v - mean_v) for t, v in points)
+    return covariance / spread_t, covariance ** 2 / (spread_t * spread_v)
+
+class ResourceSampler:
+    def __init__(self, pid, interval=0.5, context=None):
+        self.pid = pid
+        self.interval = interval
+        self.context = context or (lambda: {})
+        self.samples = []
+        #Sampling our own process (the in-process fake server): GC pauses are visible too
+        self.own_process = pid == os.getpid()
+        self.gc_pause_s = 0.0
+        self.gc_collections = 0
+        self._gc_started = None
+        #Samples come from the timer thread and from mark()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start = None
+
+    def _on_gc(self, phase, info):
+        if phase == "start":
+            self._gc_started = time.perf_counter()
+        elif self._gc_started is not None:
+            self.gc_pause_s += time.perf_counter() - self._gc_started
+            self.gc_collections += 1
+            self._gc_started = None
+
+    def sample(self):
+        with self._lock:
+            reading = read_proc(self.pid)
+            reading["t"] = time.perf_counter() - self._start
+            if self.own_process:
+                reading["gc_pause_s"] = self.gc_pause_s
+                reading["gc_collections"] = self.gc_collections
+            reading.update(self.context())
+            self.samples.append(reading)
+            return reading
+
+    #Extra sample between timer ticks, e.g. when a test phase starts or ends, so
+    #short tests are charged what they used rather than whole timer intervals
+    def mark(self):
+        if self._stop.is_set():
+            return
+        try:
+            self.sample()
+        except OSError:
+            pass
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except OSError:
+                #The server went away
+                return
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self.own_process:
+            gc.callbacks.append(self._on_gc)
+        self.sample()
+        self._thread = threading.Thread(target=self._run, name="resource-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            self.sample()
+        except OSError:
+            pass
+        if self.own_process and self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+
+    #Resource use per value of the `key` tag. CPU, I/O and GC between two samples
+    #are charged to whatever was running at the later one.
+    def summary_by(self, key):
+        groups = {}
+        for previous, sample in zip(self.samples, self.samples[1:]):
+            name = sample.get(key)
+            if name is None:
+                continue
+            group = groups.setdefault(name, {
+                "samples": 0, "cpu_s": 0.0, "wall_s": 0.0, "rss_start_mb": previous["rss_bytes"] / megabyte,
+                "rss_max_mb": 0.0, "threads_max": 0, "ctx_switches": 0, "rchar": 0, "wchar": 0,
+            })
+            group["samples"] += 1
+            group["cpu_s"] += sample["cpu_s"] - previous["cpu_s"]
+            group["wall_s"] += sample["t"] - previous["t"]
+            group["rss_end_mb"] = sample["rss_bytes"] / megabyte
+            group["rss_max_mb"] = max(group["rss_max_mb"], sample["rss_bytes"] / megabyte)
+            group["threads_max"] = max(group["threads_max"], sample["threads"])
+            group["ctx_switches"] += sample["ctx_switches"] - previous["ctx_switches"]
+            group["rchar"] += sample["rchar"] - previous["rchar"]
+            group["wchar"] += sample["wchar"] - previous["wchar"]
+            if self.own_process:
+                group["gc_pause_s"] = group.get("gc_pause_s", 0.0) + sample["gc_pause_s"] - previous["gc_pause_s"]
+        for group in groups.values():
+            group["rss_growth_mb"] = group["rss_end_mb"] - group["rss_start_mb"]
+            group["cpu_percent"] = group["cpu_s"] / group["wall_s"] * 100 if group["wall_s"] else 0.0
+        return groups
+
+    #RSS that keeps climbing for the whole session: a steady upward trend
+    #(r^2 >= min_r2) adding up to at least min_growth_mb from start to end
+    def memory_trend(self, min_growth_mb=10.0, min_r2=0.6):
+        points = [(sample["t"], sample["rss_bytes"] / megabyte) for sample in self.samples]
+        slope, r2 = _trend(points)
+        span = points[-1][0] - points[0][0] if points else 0.0
+        growth = slope * span
+        return {
+            "start_mb": points[0][1] if points else 0.0,
+            "end_mb": points[-1][1] if points else 0.0,
+            "slope_mb_per_min": slope * 60,
+            "r2": r2,
+            "growth_mb": growth,
+            "growing": growth >= min_growth_mb and r2 >= min_r2,
+        }
+
+    def report(self, key):
+        if not self.samples:
+            return {"pid": self.pid, "samples": 0}
+        first, last = self.samples[0], self.samples[-1]
+        report = {
+            "pid": self.pid,
+            "own_process": self.own_process,
+            "interval_s": self.interval,
+            "samples": len(self.samples),
+            "cpu_s": last["cpu_s"] - first["cpu_s"],
+            "peak_rss_mb": max(sample["rss_bytes"] for sample in self.samples) / megabyte,
+            "threads_max": max(sample["threads"] for sample in self.samples),
+            "memory": self.memory_trend(),
+            "by_" + key: self.summary_by(key),
+        }
+        if self.own_process:
+            report["gc_pause_s"] = last["gc_pause_s"] - first["gc_pause_s"]
+            report["gc_collections"] = last["gc_collections"] - first["gc_collections"]
+        return report
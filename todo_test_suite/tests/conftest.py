@@ -0,0 +1,332 @@
+import json
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.commands import (StateSnapshot, TodoClient, configure_client, delete_all_todos, get_client, list_all_todos,
+                          restorable, restore_state, url, wait_for_server)
+from src.fake_server import TodoStore, start_fake_server
+from src.lifecycle import ManagedServer
+from src.cassette import CassetteLibrary, CassettePlugin
+from src import async_client
+from src.instrumentation import RequestRecorder, RequestTimingPlugin
+from src.resources import ResourceSampler, find_listening_pid
+from urllib.parse import urlsplit
+
+#Number of requests the async fixtures keep in flight at once
+async_limit = 10
+
+#Every request made by the fixtures and tests is timed and tagged with the
+#running test/phase/fixture. TODO_INSTRUMENT_REPORT=path also dumps it as JSON.
+recorder = RequestRecorder()
+
+#TODO_CASSETTE=record|replay|strict records or replays each test's HTTP exchanges
+cassette_mode = os.environ.get("TODO_CASSETTE")
+cassettes = None
+if cassette_mode:
+    cassettes = CassetteLibrary(
+        os.environ.get("TODO_CASSETTE_DIR", os.path.join(os.path.dirname(__file__), "cassettes")),
+        cassette_mode,
+    )
+
+#TODO_CLIENT_CACHE=on serves repeated GETs of unchanged todos from a local LRU,
+#TODO_CLIENT_CACHE=verify still asks the server and counts stale cache entries
+client_cache = os.environ.get("TODO_CLIENT_CACHE") or None
+
+#TODO_SAMPLE_SERVER=1 samples the server process from /proc at every test phase
+#boundary and every TODO_SAMPLE_INTERVAL seconds (0.2 by default) in between,
+#tagged with the running test. CPU time comes in clock ticks (usually 10ms),
+#so for tests of a few milliseconds it is coarse.
+#The process is the one listening on the server's port unless TODO_SERVER_PID says otherwise.
+sample_server = os.environ.get("TODO_SAMPLE_SERVER") == "1" or bool(os.environ.get("TODO_SERVER_PID"))
+sampler = None
+
+#How long the server under test took to answer, reported at the end of the session:
+#from launch when the session started it, otherwise from the first readiness check
+readiness = {}
+
+#Under pytest-xdist every worker needs a server of its own, otherwise the
+#wipe/restore fixtures of one worker delete the data of another.
+def worker_index():
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "")
+    return int(worker[2:]) if worker.startswith("gw") else None
+
+#Pick this worker's server from TODO_SERVER_URLS (comma separated, one per worker)
+def worker_server_url():
+    urls = [u.strip() for u in os.environ.get("TODO_SERVER_URLS", "").split(",") if u.strip()]
+    index = worker_index()
+    if index is None:
+        return urls[0] if urls else os.environ.get("TODO_SERVER_URL", url)
+
+    worker_count = int(os.environ.get("PYTEST_XDIST_WORKER_COUNT", "1"))
+    if worker_count > 1 and len(urls) < worker_count:
+        pytest.fail(
+            f"{worker_count} xdist workers need {worker_count} servers in TODO_SERVER_URLS "
+            "(or TODO_SERVER=fake for one in-process server per worker).",
+            pytrace=False,
+        )
+    return urls[index] if urls else os.environ.get("TODO_SERVER_URL", url)
+
+#Base URL of the server under test. TODO_SERVER=fake starts the in-process
+#stand-in on an ephemeral port, so each xdist worker gets its own instance.
+#TODO_SERVER_CMD launches that command instead (or reuses the instance a previous
+#session left running), one per worker; TODO_SERVER_STOP=1 shuts it down afterwards.
+@pytest.fixture(scope="session")
+def todo_server():
+    if cassette_mode in ("replay", "strict"):
+        #Replayed responses don't need a server
+        yield worker_server_url()
+    elif os.environ.get("TODO_SERVER") == "fake":
+        server = start_fake_server()
+        yield server.url
+        server.stop()
+    elif os.environ.get("TODO_SERVER_CMD"):
+        port = os.environ.get("TODO_SERVER_PORT")
+        if "{port}" not in os.environ["TODO_SERVER_CMD"] and int(os.environ.get("PYTEST_XDIST_WORKER_COUNT", 1)) > 1:
+            pytest.fail("Every xdist worker launches its own server, TODO_SERVER_CMD needs a {port} placeholder",
+                        pytrace=False)
+        server = ManagedServer(
+            os.environ["TODO_SERVER_CMD"],
+            port=int(port) if port else None,
+            instance=os.environ.get("PYTEST_XDIST_WORKER", ""),
+        ).start()
+        if server.readiness is not None:
+            readiness.update(server.readiness)
+        yield server.url
+        if os.environ.get("TODO_SERVER_STOP") == "1":
+            server.stop()
+    else:
+        yield worker_server_url()
+
+#One pooled client shared by every test module in the session
+@pytest.fixture(scope="session")
+def client(todo_server):
+    #With cassettes every test must make the same requests whichever tests ran
+    #before it, so cleanup always lists instead of trusting the StateTracker
+    todo_client = configure_client(todo_server, cache=client_cache, track_state=cassettes is None)
+    todo_client.add_observer(recorder.record)
+    if cassettes is not None:
+        cassettes.attach(todo_client)
+    return todo_client
+
+#Started by the first test that needs the server, so offline tests never start one
+@pytest.fixture(scope="session")
+def server_resources(todo_server):
+    global sampler
+    if not sample_server or cassette_mode in ("replay", "strict"):
+        yield None
+        return
+    pid = os.environ.get("TODO_SERVER_PID")
+    pid = int(pid) if pid else find_listening_pid(urlsplit(todo_server).port or 80)
+    if pid is None:
+        pytest.exit(f"TODO_SAMPLE_SERVER=1 but no process we can see listens on {todo_server}, "
+                    "set TODO_SERVER_PID", returncode=2)
+    sampler = ResourceSampler(
+        pid,
+        float(os.environ.get("TODO_SAMPLE_INTERVAL", 0.2)),
+        lambda: {"test": recorder.context["test"], "phase": recorder.context["phase"]},
+    ).start()
+    recorder.phase_listeners.append(sampler.mark)
+    yield sampler
+    recorder.phase_listeners.remove(sampler.mark)
+    sampler.stop()
+
+#Seed todos over pipelined connections, returns the POST responses in order
+@pytest.fixture(scope="session")
+def seed_todos(client):
+    def seed(todos, **kwargs):
+        #Cassettes need every request on the recorded client, in a repeatable order
+        if cassettes is not None:
+            return [client.create_todo(todo, **kwargs) for todo in todos]
+        return async_client.run(
+            async_client.pipeline_seed_todos, todos, base_url=client.base_url, limit=async_limit,
+            observers=[recorder.record], tracker=client.tracker, **kwargs,
+        )
+    return seed
+
+#Re-create todos captured from GET /todos over pipelined connections
+@pytest.fixture(scope="session")
+def restore_todos(client):
+    def restore(todos):
+        if cassettes is not None:
+            return [client.create_todo(restorable(todo)) for todo in todos]
+        return async_client.run(
+            async_client.pipeline_seed_todos, [restorable(todo) for todo in todos], base_url=client.base_url,
+            limit=async_limit, observers=[recorder.record], tracker=client.tracker,
+        )
+    return restore
+
+#In-process fake server for the tests of the client helpers themselves, which
+#need a server they can break and inspect whatever server the suite runs against
+@pytest.fixture(scope="session")
+def fake_server():
+    server = start_fake_server()
+    yield server
+    server.stop()
+
+#Fresh client against an emptied fake server
+@pytest.fixture(scope="function")
+def fake_client(fake_server):
+    fake_server.store = TodoStore()
+    fake = TodoClient(fake_server.url)
+    yield fake
+    fake.close()
+
+#Ensure system is ready to be tested. Requested by the fixtures that touch the
+#server, tests that need no server (or bring the fake one) run without it.
+@pytest.fixture(scope="session")
+def check_system_status(client, server_resources):
+    result = wait_for_server(client)
+    if not result["ready"]:
+        pytest.exit("System is not ready for testing. Exiting the test session.", returncode=1)
+    if not readiness:
+        readiness.update(result)
+
+#Save the system state to restore after test suite is run. Session-scoped so the
+#snapshot and restore happen once, not once per test module.
+@pytest.fixture(scope="session")
+def save_system_state(client, check_system_status):
+    #Capture the full state once before the tests
+    snapshot = StateSnapshot.capture(client)
+    
+    #Let tests run
+    yield list(snapshot.todos.values())
+
+    #Restore the initial state, skipped when nothing changed
+    restore_state(snapshot, client)
+
+#Setup environment for each test
+@pytest.fixture(scope="function")
+def setup_todos(client, check_system_status):
+    #Remove everything from environment
+    delete_all_todos(client)
+    
+    # Wait for test to execute
+    yield
+
+    #Remove everything from environment
+    delete_all_todos(client)
+
+#Save initial state for the unexpected behavior tests
+@pytest.fixture(scope="function")
+def save_initial_state(client, restore_todos, setup_todos):
+    #Save the system state before the test
+    initial_state = list_all_todos(client)
+
+    delete_all_todos(client)
+    
+    #Wait for test to execute
+    yield initial_state
+
+    #Delete anything that was created in the test
+    delete_all_todos(client)
+
+    #Restore initial state
+    restore_todos(initial_state)
+
+#Registered as a plugin rather than conftest hooks so session-scoped fixtures are timed too
+def pytest_configure(config):
+    config.pluginmanager.register(RequestTimingPlugin(recorder), "todo-request-timings")
+    if cassettes is not None:
+        config.pluginmanager.register(CassettePlugin(cassettes), "todo-cassettes")
+
+#pytest-xdist workers have no terminal summary of their own: hand the timings
+#and session metrics to the controller, which reports for all of them
+def pytest_sessionfinish(session):
+    workeroutput = getattr(session.config, "workeroutput", None)
+    if workeroutput is None:
+        return
+    recorder.metrics["connections"] = get_client().connection_stats()
+    recorder.metrics["cache"] = get_client().cache.stats() if get_client().cache is not None else None
+    if readiness.get("ready"):
+        recorder.metrics["time_to_ready"] = readiness["time_to_ready"]
+    if sampler is not None:
+        recorder.metrics["server_resources"] = sampler.report("test")
+    workeroutput["todo_request_timings"] = json.dumps(recorder.export())
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    exported = getattr(node, "workeroutput", {}).get("todo_request_timings")
+    if exported:
+        recorder.absorb(json.loads(exported))
+
+#Resource use of one sampled server process
+def write_resources(terminalreporter, resources):
+    whose = f"pid {resources['pid']}" + (", includes the client" if resources["own_process"] else "")
+    terminalreporter.write_sep("-", f"todo server resources ({whose})")
+    terminalreporter.write_line(
+        f"{resources['samples']} samples: cpu {resources['cpu_s']:.2f}s  "
+        f"peak rss {resources['peak_rss_mb']:.1f}MB  threads max {resources['threads_max']}"
+        + (f"  gc {resources['gc_pause_s'] * 1000:.1f}ms in {resources['gc_collections']} collections"
+           if resources["own_process"] else "")
+    )
+    tests = sorted(resources["by_test"].items(), key=lambda item: item[1]["cpu_s"], reverse=True)
+    for name, row in tests[:5]:
+        terminalreporter.write_line(
+            f"  {name.rpartition('/')[2]:<64} cpu={row['cpu_s'] * 1000:7.1f}ms ({row['cpu_percent']:5.1f}%) "
+            f"rss {row['rss_growth_mb']:+.2f}MB threads={row['threads_max']}"
+        )
+    memory = resources["memory"]
+    if memory["growing"]:
+        terminalreporter.write_line(
+            f"WARNING: server memory grew {memory['growth_mb']:.1f}MB ({memory['slope_mb_per_min']:.1f}MB/min, "
+            f"r2={memory['r2']:.2f}) over the session, possible leak"
+        )
+    else:
+        terminalreporter.write_line(
+            f"rss {memory['start_mb']:.1f}MB -> {memory['end_mb']:.1f}MB, no sustained growth"
+        )
+
+#Show how well the connection pool was reused, and where the time went
+def pytest_terminal_summary(terminalreporter):
+    client = get_client()
+    stats = client.connection_stats()
+    workers = recorder.metrics.get("workers", [])
+    if workers:
+        stats = {
+            key: sum(worker["connections"][key] for worker in workers)
+            for key in ("requests", "opened", "reused")
+        }
+    if stats["requests"] == 0 and not recorder.records:
+        return
+    terminalreporter.write_sep("-", "todo client connections")
+    #Replayed cassettes never reach the connection pool
+    if stats["requests"]:
+        terminalreporter.write_line(
+            f"requests: {stats['requests']}  opened: {stats['opened']}  reused: {stats['reused']}"
+        )
+
+    if client.cache is not None:
+        cache_stats = client.cache.stats()
+        recorder.metrics["cache"] = cache_stats
+        terminalreporter.write_line(
+            f"cache ({client.cache.mode}): hits: {cache_stats['hits']}  revalidated: {cache_stats['revalidated']}  "
+            f"misses: {cache_stats['misses']}  verified: {cache_stats['verified']}  stale: {cache_stats['stale']}  "
+            f"invalidations: {cache_stats['invalidations']}"
+        )
+
+    if readiness.get("ready"):
+        recorder.metrics["time_to_ready"] = readiness["time_to_ready"]
+        recorder.metrics["ready_attempts"] = readiness["attempts"]
+        terminalreporter.write_line(
+            f"server ready after {readiness['time_to_ready'] * 1000:.1f}ms ({readiness['attempts']} attempts)"
+        )
+
+    #Under xdist every worker sampled its own server
+    if sampler is not None:
+        reports = [sampler.report("test")]
+        recorder.metrics["server_resources"] = reports[0]
+    else:
+        reports = [worker["server_resources"] for worker in workers if worker.get("server_resources")]
+    for resources in reports:
+        write_resources(terminalreporter, resources)
+
+    terminalreporter.write_sep("-", "todo request timings")
+    for line in recorder.report_lines():
+        terminalreporter.write_line(line)
+    report_path = os.environ.get("TODO_INSTRUMENT_REPORT")
+    if report_path:
+        recorder.write(report_path)
+        terminalreporter.write_line(f"request timings written to {report_path}")
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.commands import TodoClient, delete_all_todos, list_all_todos
+from src.async_client import AsyncTodoClient, pipeline_seed_todos, run, seed_todos
+
+def todos(count):
+    return [{"title": f"Todo {number}", "doneStatus": False, "description": "async"} for number in range(count)]
+
+def run_with(fake_client, scenario, **kwargs):
+    async def main():
+        async with AsyncTodoClient(fake_client.base_url, **kwargs) as client:
+            return await scenario(client)
+    return asyncio.run(main())
+
+def test_requests_reuse_connections(fake_client):
+    async def scenario(client):
+        created = await client.create_todo(todos(1)[0])
+        todo_id = created.json()["id"]
+        fetched = await client.get_todo(todo_id)
+        head = await client.head_todos()
+        deleted = await client.delete_todo(todo_id)
+        return created, fetched, head, deleted, client.connection_stats()
+
+    created, fetched, head, deleted, stats = run_with(fake_client, scenario, limit=1)
+    assert created.status_code == 201
+    assert fetched.json()["todos"][0]["title"] == "Todo 0"
+    assert head.status_code == 200 and head.content == b""
+    assert deleted.status_code == 200
+    assert stats == {"requests": 4, "opened": 1, "reused": 3}
+
+def test_seed_and_pipeline_keep_order(fake_client):
+    payloads = todos(40)
+    concurrent = run(seed_todos, payloads[:20], base_url=fake_client.base_url, limit=4)
+    pipelined = run(pipeline_seed_todos, payloads[20:], base_url=fake_client.base_url, limit=4, depth=8)
+
+    responses = concurrent + pipelined
+    assert [response.status_code for response in responses] == [201] * 40
+    assert [response.json()["title"] for response in responses] == [todo["title"] for todo in payloads]
+    assert len(list_all_todos(fake_client)) == 40
+
+def test_shared_tracker_sees_async_creates(fake_client):
+    delete_all_todos(fake_client)
+    run(pipeline_seed_todos, todos(5), base_url=fake_client.base_url, tracker=fake_client.tracker)
+
+    summary = delete_all_todos(fake_client)
+    assert not summary["listed"]
+    assert summary["deleted"] == 5
+    assert list_all_todos(fake_client) == []
+
+#The server closing an idle keep-alive connection, seen from the client side
+def drop_idle_connection(client):
+    client._idle[0].reader.feed_eof()
+
+def test_idempotent_request_is_retried_on_a_dropped_connection(fake_client):
+    async def scenario(client):
+        await client.list_todos()
+        drop_idle_connection(client)
+        response = await client.list_todos()
+        return response, client.connection_stats()
+
+    response, stats = run_with(fake_client, scenario, limit=1)
+    assert response.status_code == 200
+    assert stats["opened"] == 2
+
+def test_post_is_not_resent_on_a_dropped_connection(fake_client):
+    delete_all_todos(fake_client)
+    assert fake_client.tracker.is_empty()
+
+    async def scenario(client):
+        await client.list_todos()
+        drop_idle_connection(client)
+        with pytest.raises(ConnectionError):
+            await client.create_todo(todos(1)[0])
+        return client.connection_stats()
+
+    stats = run_with(fake_client, scenario, limit=1, tracker=fake_client.tracker)
+    assert stats["opened"] == 1
+    #At most the one POST the server may have applied, never a duplicate
+    assert len(list_all_todos(TodoClient(fake_client.base_url, track_state=False))) <= 1
+    #Whether it landed is unknown, so the next clean up has to list
+    assert fake_client.tracker.pending() is None
+    assert delete_all_todos(fake_client)["listed"]
@@ -0,0 +1,66 @@
+import os
+import random
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.histogram import LatencyHistogram, percentile
+
+#Latencies in seconds: a tight unimodal set, a long-tailed one and two modes far apart
+def sample_sets():
+    rng = random.Random(429)
+    return {
+        "uniform": [rng.uniform(0.001, 0.002) for _ in range(5000)],
+        "lognormal": [rng.lognormvariate(-6, 1.5) for _ in range(5000)],
+        "bimodal": [rng.choice((rng.gauss(0.0005, 0.00005), rng.gauss(0.8, 0.05))) for _ in range(5000)],
+    }
+
+def recorded(samples):
+    histogram = LatencyHistogram()
+    for seconds in samples:
+        histogram.record(seconds)
+    return histogram
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for value in range(histogram.sub_bucket_count):
+        assert histogram.value_for(histogram.bucket_for(value)) == value
+
+@pytest.mark.parametrize("value", [2048, 2049, 4095, 4096, 12345, 999999, 123456789])
+def test_bucket_bounds(value):
+    histogram = LatencyHistogram()
+    bucket = histogram.bucket_for(value)
+    upper = histogram.value_for(bucket)
+    assert value <= upper <= value * (1 + 1e-3)
+    #The value just past the bucket lands in the next one
+    assert histogram.bucket_for(upper + 1) == bucket + 1
+
+@pytest.mark.parametrize("name", ["uniform", "lognormal", "bimodal"])
+def test_percentiles_within_relative_error(name):
+    samples = sample_sets()[name]
+    histogram = recorded(samples)
+    exact = sorted(max(0, int(round(seconds * 1e6))) / 1000 for seconds in samples)
+    for q in (50, 90, 99, 99.9, 100):
+        expected = percentile(exact, q)
+        assert histogram.percentile(q) == pytest.approx(expected, rel=1e-3)
+    assert histogram.total == len(samples)
+    assert histogram.max / 1000 == exact[-1]
+
+def test_merge_equals_recording_the_union():
+    sets = sample_sets()
+    merged = recorded(sets["lognormal"]).merge(recorded(sets["bimodal"]))
+    union = recorded(sets["lognormal"] + sets["bimodal"])
+    assert merged.counts == union.counts
+    assert (merged.total, merged.sum, merged.min, merged.max) == (union.total, union.sum, union.min, union.max)
+    assert merged.summary() == union.summary()
+
+def test_merge_empty():
+    histogram = recorded(sample_sets()["uniform"])
+    before = histogram.summary()
+    assert histogram.merge(LatencyHistogram()).summary() == before
+    assert LatencyHistogram().merge(histogram).summary() == before
+
+def test_merge_needs_same_precision():
+    with pytest.raises(ValueError):
+        LatencyHistogram(3).merge(LatencyHistogram(2))
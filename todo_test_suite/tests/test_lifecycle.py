@@ -0,0 +1,62 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.lifecycle import ManagedServer
+
+#Answers GET / after a pause, like a warm server that is busy
+slow_server = """
+import sys, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class Slow(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(0.2)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+ThreadingHTTPServer(("127.0.0.1", int(sys.argv[1])), Slow).serve_forever()
+"""
+
+@pytest.fixture
+def slow_command(tmp_path):
+    script = tmp_path / "slow_server.py"
+    script.write_text(slow_server)
+    return f"{sys.executable} {script} {{port}}"
+
+def test_start_reuses_slow_server(slow_command, tmp_path):
+    lock_path = str(tmp_path / "server.json")
+    first = ManagedServer(slow_command, lock_path=lock_path, ready_timeout=10.0).start()
+    try:
+        assert not first.reused
+        second = ManagedServer(slow_command, lock_path=lock_path).start()
+        assert second.reused
+        assert second.pid == first.pid
+        assert second.port == first.port
+    finally:
+        first.terminate(first.pid)
+        first.remove_lock()
+
+def test_start_refuses_a_port_in_use(slow_command, tmp_path):
+    first = ManagedServer(slow_command, lock_path=str(tmp_path / "first.json"), ready_timeout=10.0).start()
+    try:
+        #Same port, but no lock file pointing at the server already there
+        command = slow_command.replace("{port}", str(first.port))
+        with pytest.raises(RuntimeError, match="already in use"):
+            ManagedServer(command, port=first.port, lock_path=str(tmp_path / "second.json")).start()
+    finally:
+        first.terminate(first.pid)
+        first.remove_lock()
+
+def test_start_reports_a_server_that_exits(tmp_path):
+    server = ManagedServer(f"{sys.executable} -c \"import sys; sys.exit(3)\" {{port}}",
+                           lock_path=str(tmp_path / "server.json"), ready_timeout=1.0)
+    with pytest.raises(RuntimeError, match="exited with code 3"):
+        server.start()
+    assert server.read_lock() is None
@@ -0,0 +1,26 @@
+import os
+import random
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.benchmark import IdPool, load_worker, parse_mix, seed_dataset
+from src.commands import list_all_todos
+
+def test_checked_out_ids_are_not_handed_out_twice():
+    ids = IdPool(["1", "2", "3"])
+    rng = random.Random(0)
+    taken = {ids.checkout(rng) for _ in range(3)}
+    assert taken == {"1", "2", "3"}
+    assert ids.checkout(rng) is None
+
+    ids.add("2")
+    assert ids.checkout(rng) == "2"
+
+def test_concurrent_deletes_cause_no_errors(fake_client):
+    ids = seed_dataset(fake_client, 20, 4)
+    result = load_worker(fake_client, ids, parse_mix("get=4,amend=1,delete=2,create=2"), ["json", "xml"], 600, 16, 0)
+
+    assert sum(result["errors"].values()) == 0
+    #Ids left in the pool are exactly the todos left on the server
+    assert sorted(map(str, result["ids"])) == sorted(todo["id"] for todo in list_all_todos(fake_client))
@@ -0,0 +1,26 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.instrumentation import RequestRecorder
+from src.resources import ResourceSampler
+
+@pytest.mark.skipif(not os.path.exists(f"/proc/{os.getpid()}/stat"), reason="needs /proc")
+def test_phase_boundaries_are_sampled():
+    recorder = RequestRecorder()
+    #A timer far longer than the tests, only the boundaries produce samples
+    sampler = ResourceSampler(os.getpid(), 60, lambda: {"test": recorder.context["test"]}).start()
+    recorder.phase_listeners.append(sampler.mark)
+    for test in ("first", "second"):
+        for phase in ("setup", "call", "teardown"):
+            recorder.enter_phase(test, phase)
+            recorder.leave_phase()
+    sampler.stop()
+
+    by_test = sampler.summary_by("test")
+    assert set(by_test) == {"first", "second"}
+    #Each phase is charged from its own start to its own end
+    assert by_test["first"]["samples"] == 3
+    assert by_test["second"]["samples"] == 3
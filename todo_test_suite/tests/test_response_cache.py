@@ -0,0 +1,143 @@
+import os
+import sys
+import pytest
+import requests
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.commands import *
+from src.fake_server import TodoStore
+
+@pytest.fixture
+def cached_client(fake_server):
+    fake_server.store = TodoStore()
+    clients = []
+    def make(**kwargs):
+        client = TodoClient(fake_server.url, **kwargs)
+        clients.append(client)
+        return client
+    yield make
+    for client in clients:
+        client.close()
+
+def create(client, title):
+    response = client.create_todo({"title": title})
+    assert response.status_code == 201
+    return str(response.json()["id"])
+
+def requests_sent(client):
+    return client.connection_stats()["requests"]
+
+def test_repeated_get_is_a_hit(cached_client):
+    client = cached_client(cache="on")
+    todo_id = create(client, "Cached")
+    first = client.get_todo(todo_id)
+    sent = requests_sent(client)
+
+    assert client.get_todo(todo_id) is first
+    assert requests_sent(client) == sent
+    assert client.cache.stats()["hits"] == 1
+
+def test_read_after_write_is_fresh(cached_client):
+    client = cached_client(cache="on")
+    todo_id = create(client, "Before")
+    assert client.get_todo(todo_id).json()["todos"][0]["title"] == "Before"
+    assert len(client.list_todos().json()["todos"]) == 1
+
+    assert client.amend_todo(todo_id, {"title": "After"}).status_code == 200
+    assert client.get_todo(todo_id).json()["todos"][0]["title"] == "After"
+    create(client, "Second")
+    assert len(client.list_todos().json()["todos"]) == 2
+
+def test_write_through_shared_tracker_invalidates(cached_client):
+    client = cached_client(cache="on")
+    other = cached_client()
+    other.tracker = client.tracker
+    todo_id = create(client, "Before")
+    client.get_todo(todo_id)
+
+    assert other.delete_todo(todo_id).status_code == 200
+    assert client.get_todo(todo_id).status_code == 404
+
+def test_verify_counts_stale_entries(cached_client):
+    client = cached_client(cache="verify")
+    todo_id = create(client, "Before")
+    client.get_todo(todo_id)
+    client.get_todo(todo_id)
+    assert client.cache.stats()["stale"] == 0
+
+    #Written behind the cache's back, so the cached entry is now wrong
+    assert cached_client(track_state=False).amend_todo(todo_id, {"title": "After"}).status_code == 200
+    response = client.get_todo(todo_id)
+    assert response.json()["todos"][0]["title"] == "After"
+    stats = client.cache.stats()
+    assert stats["verified"] == 2
+    assert stats["stale"] == 1
+
+def test_lru_evicts_at_capacity(cached_client):
+    client = cached_client(cache="on", cache_size=2)
+    ids = [create(client, f"Todo {number}") for number in range(3)]
+    for todo_id in ids:
+        client.get_todo(todo_id)
+    stats = client.cache.stats()
+    assert stats["entries"] == 2
+    assert stats["misses"] == 3
+
+    #The least recently used todo is gone, the other two are still there
+    client.get_todo(ids[2])
+    client.get_todo(ids[1])
+    assert client.cache.stats()["hits"] == 2
+    client.get_todo(ids[0])
+    assert client.cache.stats()["misses"] == 4
+
+def test_cache_false_bypasses(cached_client):
+    client = cached_client(cache="on")
+    todo_id = create(client, "Cached")
+    client.get_todo(todo_id)
+    sent = requests_sent(client)
+    before = client.cache.stats()
+
+    assert client.request("GET", f"/todos/{todo_id}", cache=False).status_code == 200
+    assert requests_sent(client) == sent + 1
+    assert client.cache.stats() == before
+
+def test_response_from_before_a_write_is_not_stored(cached_client):
+    client = cached_client(cache="on")
+    cache = client.cache
+    key = cache.key("/todos", None)
+    generation = cache.generation
+    response = client.list_todos(cache=False)
+
+    #A write lands while the listing is in flight
+    cache.observe("POST", "/todos", 201)
+    cache.put(key, response, generation)
+    assert cache.get(key) is None
+
+    cache.put(key, response, cache.generation)
+    assert cache.get(key) is not None
+
+def test_etag_revalidation(cached_client, monkeypatch):
+    client = cached_client(cache="on")
+    todo_id = create(client, "Tagged")
+    send = client._send
+    conditional = []
+
+    def tagged(method, path, headers=None, **kwargs):
+        if headers and headers.get("If-None-Match") == '"v1"':
+            conditional.append(path)
+            not_modified = requests.Response()
+            not_modified.status_code = 304
+            return not_modified
+        response = send(method, path, headers=headers, **kwargs)
+        response.headers["ETag"] = '"v1"'
+        return response
+    monkeypatch.setattr(client, "_send", tagged)
+
+    first = client.get_todo(todo_id)
+    assert client.cache.get(client.cache.key(f"/todos/{todo_id}", None)).etag == '"v1"'
+    #An entry with a validator is never trusted outright, the server confirms it
+    assert client.get_todo(todo_id) is first
+    assert conditional == [f"/todos/{todo_id}"]
+    stats = client.cache.stats()
+    assert stats["revalidated"] == 1
+    assert stats["hits"] == 0
@@ -0,0 +1,78 @@
+import os
+import random
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.benchmark import analyse_soak, drift, mann_kendall
+
+#30 windows of a 10ms latency with 5% noise, the same every run
+def noise(seed=429, n=30):
+    rng = random.Random(seed)
+    return [10 * (1 + rng.gauss(0, 0.05)) for _ in range(n)]
+
+def test_too_short_for_a_trend():
+    assert mann_kendall([1, 2, 3]) == {"n": 3, "z": 0.0, "p": 1.0, "slope": 0.0}
+
+def test_constant_series():
+    trend = drift([5.0] * 20)
+    assert trend["p"] == 1.0
+    assert trend["slope"] == 0.0
+    assert not trend["drifting"]
+
+@pytest.mark.parametrize("seed", [1, 2, 3, 429])
+def test_flat_noise_does_not_drift(seed):
+    trend = drift(noise(seed))
+    assert not trend["drifting"]
+    assert abs(trend["change"]) < 0.2
+
+def test_rising_ramp_drifts():
+    series = [value + step * 0.5 for step, value in enumerate(noise())]
+    trend = drift(series)
+    assert trend["drifting"]
+    assert trend["p"] < 0.01
+    assert trend["slope"] == pytest.approx(0.5, rel=0.2)
+    assert trend["change"] > 0
+
+def test_falling_ramp_drifts():
+    series = [value - step * 0.2 for step, value in enumerate(noise())]
+    trend = drift(series)
+    assert trend["drifting"]
+    assert trend["slope"] == pytest.approx(-0.2, rel=0.2)
+    assert trend["change"] < 0
+
+def test_significant_but_small_trend_is_not_drift():
+    series = [value + step * 0.01 for step, value in enumerate(noise())]
+    assert not drift(series)["drifting"]
+
+def test_step_change_drifts():
+    #Latency doubles halfway through and stays there
+    series = [value * (2 if step >= 15 else 1) for step, value in enumerate(noise())]
+    trend = drift(series)
+    assert trend["drifting"]
+    assert trend["slope"] > 0
+
+def test_outlier_is_not_a_trend():
+    series = noise()
+    series[-1] = 1000.0
+    assert not drift(series)["drifting"]
+
+def window(p50, rps=100.0, rss=None):
+    return {"response": {"p50_ms": p50, "p99_ms": p50 * 3}, "achieved_rps": rps, "rss_mb": rss}
+
+def test_analyse_soak_skips_warmup_and_flags_memory():
+    latencies = noise()
+    #A slow first window while the server warms up, then flat latency and slowly climbing memory
+    windows = [window(100.0, rss=50.0)] + [window(p50, rss=50.0 + step * 0.1) for step, p50 in enumerate(latencies)]
+    analysis = analyse_soak(windows, warmup=1)
+    assert analysis["analysed"] == len(latencies)
+    assert not analysis["p50_ms"]["drifting"]
+    assert not analysis["achieved_rps"]["drifting"]
+    assert analysis["rss_mb"]["growing"]
+
+def test_shrinking_memory_is_not_a_leak():
+    windows = [window(p50, rss=80.0 - step) for step, p50 in enumerate(noise())]
+    analysis = analyse_soak(windows, warmup=0)
+    assert analysis["rss_mb"]["drifting"]
+    assert not analysis["rss_mb"]["growing"]
@@ -0,0 +1,102 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.commands import *
+
+def todos():
+    return [
+        {"id": "1", "title": "Test 1", "doneStatus": "false", "description": "Initial test"},
+        {"id": "2", "title": "Test 2", "doneStatus": "true", "description": "Initial test"},
+        {"id": "3", "title": "Test 3", "doneStatus": "false", "description": ""},
+    ]
+
+def test_state_hash_ignores_order():
+    listing = todos()
+    assert StateSnapshot(listing).state_hash == StateSnapshot(list(reversed(listing))).state_hash
+
+def test_state_hash_ignores_ids():
+    renumbered = [dict(todo, id=str(int(todo["id"]) + 10)) for todo in todos()]
+    assert StateSnapshot(todos()).state_hash == StateSnapshot(renumbered).state_hash
+
+def test_state_hash_changes_with_content():
+    edited = todos()
+    edited[1]["description"] = "Edited"
+    assert StateSnapshot(todos()).state_hash != StateSnapshot(edited).state_hash
+
+def test_state_hash_counts_duplicates():
+    #Two identical todos are not the same state as one
+    listing = todos()
+    duplicated = listing + [dict(listing[0], id="4")]
+    assert StateSnapshot(listing).state_hash != StateSnapshot(duplicated).state_hash
+
+def test_contains_accepts_dicts_and_todos():
+    snapshot = StateSnapshot(todos())
+    assert todos()[0] in snapshot
+    assert Todo.from_dict(todos()[1]) in snapshot
+    assert dict(todos()[0], title="Other") not in snapshot
+
+def test_diff_unchanged():
+    diff = StateSnapshot(todos()).diff(list(reversed(todos())))
+    assert diff == StateDiff(added=set(), removed=set(), modified=set(), unchanged={"1", "2", "3"})
+
+def test_diff_added_removed_modified():
+    current = todos()
+    current[0]["doneStatus"] = "true"
+    del current[2]
+    current.append({"id": "4", "title": "Test 4", "doneStatus": "false", "description": ""})
+
+    diff = StateSnapshot(todos()).diff(current)
+    assert diff.added == {"4"}
+    assert diff.removed == {"3"}
+    assert diff.modified == {"1"}
+    assert diff.unchanged == {"2"}
+
+def test_restore_state_reverts_changes(fake_client):
+    seeded = [restorable(todo) for todo in todos()]
+    for todo in seeded:
+        assert fake_client.create_todo(todo).status_code == 201
+    snapshot = StateSnapshot.capture(fake_client)
+
+    #Edit one, delete one and add one
+    ids = sorted(snapshot.todos, key=int)
+    assert fake_client.amend_todo(ids[0], {"title": "Changed"}).status_code == 200
+    assert fake_client.delete_todo(ids[1]).status_code == 200
+    assert fake_client.create_todo({"title": "Extra"}).status_code == 201
+    assert StateSnapshot.capture(fake_client).state_hash != snapshot.state_hash
+
+    summary = restore_state(snapshot, fake_client)
+    assert not summary["skipped"]
+    assert summary["deleted"] == 2
+    assert summary["created"] == 2
+
+    restored = StateSnapshot.capture(fake_client)
+    assert restored.state_hash == snapshot.state_hash
+    #The untouched todo keeps its id
+    assert ids[2] in restored.todos
+
+def test_restore_state_skips_when_unchanged(fake_client):
+    for todo in todos():
+        assert fake_client.create_todo(restorable(todo)).status_code == 201
+    snapshot = StateSnapshot.capture(fake_client)
+    requests_before = fake_client.connection_stats()["requests"]
+
+    summary = restore_state(snapshot, fake_client)
+    assert summary["skipped"]
+    #Only the one listing that checks the hash
+    assert fake_client.connection_stats()["requests"] == requests_before + 1
+
+@pytest.mark.parametrize("accept", ["application/json", "application/xml"])
+def test_capture_records_the_whole_body(fake_client, accept):
+    for todo in todos():
+        assert fake_client.create_todo(restorable(todo)).status_code == 201
+    records = []
+    fake_client.add_observer(records.append)
+
+    snapshot = StateSnapshot.capture(fake_client, headers={"Accept": accept})
+    assert len(snapshot) == 3
+    #Streamed XML is reported once it has been read, with its real size
+    assert len(records) == 1
+    assert records[0]["bytes"] == len(fake_client.list_todos(headers={"Accept": accept}).content)
@@ -0,0 +1,96 @@
+import os
+import sys
+import pytest
+import requests
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.commands import *
+
+def server_ids(client):
+    return {todo["id"] for todo in list_all_todos(TodoClient(client.base_url, track_state=False))}
+
+def create(client, count):
+    ids = []
+    for number in range(count):
+        response = client.create_todo({"title": f"Todo {number}"})
+        assert response.status_code == 201
+        ids.append(str(response.json()["id"]))
+    return ids
+
+def test_tracked_delete_matches_full_listing(fake_client):
+    delete_all_todos(fake_client)
+    create(fake_client, 5)
+
+    summary = delete_all_todos(fake_client)
+    assert not summary["listed"]
+    assert summary["deleted"] == 5
+    assert server_ids(fake_client) == set()
+    assert fake_client.tracker.is_empty()
+
+def test_fresh_tracker_lists_todos_created_elsewhere(fake_client):
+    create(TodoClient(fake_client.base_url, track_state=False), 3)
+
+    #Nothing is known about the server yet, so the first clean up has to list
+    summary = delete_all_todos(fake_client)
+    assert summary["listed"]
+    assert summary["deleted"] == 3
+    assert server_ids(fake_client) == set()
+
+def test_invalidate_after_untracked_write(fake_client):
+    delete_all_todos(fake_client)
+    tracked = create(fake_client, 2)
+    untracked = create(TodoClient(fake_client.base_url, track_state=False), 2)
+    assert set(fake_client.tracker.pending()) == set(tracked)
+
+    fake_client.tracker.invalidate()
+    summary = delete_all_todos(fake_client)
+    assert summary["listed"]
+    assert summary["deleted"] == len(tracked + untracked)
+    assert server_ids(fake_client) == set()
+
+def test_shared_tracker_sees_other_clients(fake_client):
+    delete_all_todos(fake_client)
+    other = TodoClient(fake_client.base_url, track_state=False)
+    other.tracker = fake_client.tracker
+    create(other, 2)
+
+    summary = delete_all_todos(fake_client)
+    assert not summary["listed"]
+    assert summary["deleted"] == 2
+    assert server_ids(fake_client) == set()
+
+def test_tracked_todo_deleted_elsewhere(fake_client):
+    delete_all_todos(fake_client)
+    ids = create(fake_client, 2)
+    assert TodoClient(fake_client.base_url, track_state=False).delete_todo(ids[0]).status_code == 200
+
+    #The 404 for the todo that is already gone is not a failure
+    summary = delete_all_todos(fake_client)
+    assert not summary["failed"]
+    assert server_ids(fake_client) == set()
+
+def test_failed_delete_is_retried(fake_client, monkeypatch):
+    delete_all_todos(fake_client)
+    ids = create(fake_client, 3)
+
+    send = fake_client.session.request
+    def flaky(method, request_url, **kwargs):
+        if method == "DELETE" and request_url.endswith(f"/todos/{ids[0]}"):
+            raise requests.exceptions.ConnectionError("connection reset")
+        return send(method, request_url, **kwargs)
+    monkeypatch.setattr(fake_client.session, "request", flaky)
+
+    with pytest.raises(AssertionError):
+        delete_all_todos(fake_client)
+    summary = delete_all_todos(fake_client, strict=False)
+    assert list(summary["failed"]) == [ids[0]]
+    assert not fake_client.tracker.is_empty()
+    assert server_ids(fake_client) == {ids[0]}
+
+    #Once the server answers again the todo left behind is still cleaned up
+    monkeypatch.setattr(fake_client.session, "request", send)
+    summary = delete_all_todos(fake_client)
+    assert summary["deleted"] == 1
+    assert server_ids(fake_client) == set()
+    assert fake_client.tracker.is_empty()
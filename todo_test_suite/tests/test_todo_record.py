@@ -0,0 +1,30 @@
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.commands import *
+
+def test_todo_from_dict_coerces_fields():
+    todo = Todo.from_dict({"id": 3, "title": "Test 1", "doneStatus": "true", "description": "Initial test"})
+    assert todo == Todo(title="Test 1", done_status=True, description="Initial test", id="3")
+
+@pytest.mark.parametrize("field", ["title", "doneStatus", "description"])
+def test_todo_from_dict_missing_field(field):
+    data = {"id": "1", "title": "Test 1", "doneStatus": "false", "description": "Initial test"}
+    del data[field]
+    with pytest.raises(ValueError, match=field):
+        Todo.from_dict(data)
+
+def test_todo_from_xml_missing_field():
+    with pytest.raises(ValueError, match="description"):
+        list(iter_xml_todos(
+            "<todos><todo><id>1</id><title>Test 1</title><doneStatus>false</doneStatus></todo></todos>"
+        ))
+
+def test_todo_from_xml_empty_description():
+    todos = list(iter_xml_todos(
+        "<todos><todo><id>1</id><title>Test 1</title><doneStatus>false</doneStatus><description/></todo></todos>"
+    ))
+    assert todos == [Todo(title="Test 1", done_status=False, description="", id="1")]
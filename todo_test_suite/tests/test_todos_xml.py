@@ -1,18 +1,10 @@
 import os
 import sys
-import requests
-import pytest
-import xml.etree.ElementTree as ET
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.commands import *
 
-#urls of the API
-url = "http://localhost:4567/todos"
-url_shutdown = "http://localhost:4567/shutdown"
-url_docs = "http://localhost:4567/docs"
- 
 #Define todos and header that can be reused throughout the tests
 def todo_1():
     return """
@@ -38,160 +30,63 @@ def headers():
         "Content-Type": "application/xml"
     }
 
-def parse_xml_response(response_content):
-    #In order to be able to check application logic/return values
-    return ET.fromstring(response_content)
-
-#Ensure system is ready to be tested
-@pytest.fixture(scope="session", autouse=True)
-def check_system_status():
-    if not check_server_status():
-        pytest.exit("System is not ready for testing. Exiting the test session.", returncode=1)
-
-#Save the system state to restore after test suite is run
-@pytest.fixture(scope="module")
-def save_system_state():
-    #Get initial state before the test
-    response = requests.get(url)
-    if response.status_code == 200:
-        initial_todos = response.json().get('todos', [])
-    else:
-        initial_todos = []
-    
-    #Let tests run
-    yield initial_todos 
-
-    #Delete all todos
-    delete_all_todos()
-
-    #Restore the initial state
-    for todo in initial_todos:
-        #As per documentation, can't post with an ID 
-        todo.pop("id", None)
-        
-        #Restore doneStatus to proper type BOOLEAN
-        if todo["doneStatus"] == "false":
-            todo["doneStatus"] = False
-        else: 
-            todo["doneStatus"] = True
-
-        post_response = requests.post(url, json=todo)
-        assert post_response.status_code == 201
-
-#Setup environment for each test
-@pytest.fixture(scope="function")
-def setup_todos():
-    #Remove everything from environment
-    delete_all_todos()
-    
-    # Wait for test to execute
-    yield
-
-    #Remove everything from environment
-    delete_all_todos()
-
-#Save initial state for the unexpected behavior tests
-@pytest.fixture(scope="function")
-def save_initial_state(setup_todos):
-    #Save the system state before the test
-    response = requests.get(url)
-    initial_state = response.json().get('todos', [])
-
-    delete_all_todos()
-    
-    #Wait for test to execute
-    yield initial_state
-
-    #Delete anything that was created in the test
-    delete_all_todos()
-
-    #Restore initial state
-    for todo in initial_state:
-        requests.post(url, json=todo)
-
-    # Get the current system state before the test
-    response = requests.get(url)
-    initial_state = response.json().get('todos', [])
-
-    delete_all_todos()
-    
-    # Yield control to the test
-    yield initial_state
+def parse_xml_response(response):
+    #In order to be able to check application logic/return values, streamed one todo at a time
+    return list(iter_xml_todos(response))
 
-    # After the test, restore the initial state to clean up
-    delete_all_todos()
-    for todo in initial_state:
-        requests.post(url, json=todo)  # Restore saved state
-
-def test_todos_endpoint_GET_empty_xml(save_system_state, setup_todos):
-    response = requests.get(url, headers=headers())
+def test_todos_endpoint_GET_empty_xml(client, save_system_state, setup_todos):
+    response = client.list_todos(headers=headers(), stream=True)
     assert response.status_code == 200
-    response_xml = response.content
     
-    todos = parse_xml_response(response_xml)
-    todos_list = todos.findall('todo') 
+    todos_list = parse_xml_response(response)
     assert len(todos_list) == 0 
     
-def test_todos_endpoint_GET_one_xml(save_system_state, setup_todos):
-    post_response = requests.post(url, data=todo_1(), headers=headers())
+def test_todos_endpoint_GET_one_xml(client, save_system_state, setup_todos):
+    post_response = client.create_todo(data=todo_1(), headers=headers())
     assert post_response.status_code == 201
 
-    response = requests.get(url, headers=headers())
+    response = client.list_todos(headers=headers(), stream=True)
     assert response.status_code == 200
 
-    todos = parse_xml_response(response.content)
-    todos_list = todos.findall('todo')
+    todos_list = parse_xml_response(response)
 
-    observed_todo_1 = {
-        "doneStatus": todos_list[0].find("doneStatus").text,
-        "description": todos_list[0].find("description").text,
-        "title": todos_list[0].find("title").text
-    }
-    expected_todo_1 = {
-        "doneStatus": "false", 
-        "description": "Initial test",
-        "title": "Test 1"
-    }
+    observed_todo_1 = todos_list[0].without_id()
+    expected_todo_1 = Todo(
+        title="Test 1",
+        done_status=False,
+        description="Initial test"
+    )
 
     assert len(todos_list) == 1
     assert observed_todo_1 == expected_todo_1
 
-def test_todos_endpoint_GET_two_xml(save_system_state, setup_todos):
-    post_response_1 = requests.post(url, data=todo_1(), headers=headers())
+def test_todos_endpoint_GET_two_xml(client, save_system_state, setup_todos):
+    post_response_1 = client.create_todo(data=todo_1(), headers=headers())
     assert post_response_1.status_code == 201
 
-    post_response_2 = requests.post(url, data=todo_2(), headers=headers())
+    post_response_2 = client.create_todo(data=todo_2(), headers=headers())
     assert post_response_2.status_code == 201
 
-    response = requests.get(url, headers=headers())
+    response = client.list_todos(headers=headers(), stream=True)
     assert response.status_code == 200
 
-    todos = parse_xml_response(response.content)
-    todos_list = todos.findall('todo')
+    todos_list = parse_xml_response(response)
 
-    observed_todo_1 = {
-        "doneStatus": todos_list[0].find("doneStatus").text,
-        "description": todos_list[0].find("description").text,
-        "title": todos_list[0].find("title").text
-    }
+    observed_todo_1 = todos_list[0].without_id()
 
-    observed_todo_2 = {
-        "doneStatus": todos_list[1].find("doneStatus").text,
-        "description": todos_list[1].find("description").text,
-        "title": todos_list[1].find("title").text
-    }
+    observed_todo_2 = todos_list[1].without_id()
 
-    expected_todo_1 = {
-        "doneStatus": "false", 
-        "description": "Initial test",
-        "title": "Test 1"
-    }
+    expected_todo_1 = Todo(
+        title="Test 1",
+        done_status=False,
+        description="Initial test"
+    )
 
-    expected_todo_2 = {
-        "doneStatus": "true",
-        "description": "Initial test",
-        "title": "Test 2"
-    }
+    expected_todo_2 = Todo(
+        title="Test 2",
+        done_status=True,
+        description="Initial test"
+    )
 
     #Assert the observed todos match the expected todos
     assert observed_todo_1 in [expected_todo_1, expected_todo_2]
@@ -200,30 +95,26 @@ def test_todos_endpoint_GET_two_xml(save_system_state, setup_todos):
     #Ensure the two todos are not the same
     assert observed_todo_1 != observed_todo_2
 
-def test_todos_endpoint_POST_xml(save_system_state, setup_todos):
-    response = requests.post(url, data=todo_1(), headers=headers())
+def test_todos_endpoint_POST_xml(client, save_system_state, setup_todos):
+    response = client.create_todo(data=todo_1(), headers=headers())
     assert response.status_code == 201
 
-    todos = parse_xml_response(response.content)
+    todo = parse_xml_response(response)[0]
     
 
-    observed_todo_1 = {
-        "doneStatus": todos.find("doneStatus").text,
-        "description": todos.find("description").text,
-        "title": todos.find("title").text
-    }
-    expected_todo_1 = {
-        "doneStatus": "false", 
-        "description": "Initial test",
-        "title": "Test 1"
-    }
+    observed_todo_1 = todo.without_id()
+    expected_todo_1 = Todo(
+        title="Test 1",
+        done_status=False,
+        description="Initial test"
+    )
 
     #Assert all fields are correct and present
     assert observed_todo_1 == expected_todo_1
-    assert todos.find("id") is not None
+    assert todo.id is not None
 
-def test_todos_endpoint_HEAD_xml(save_system_state, setup_todos):
-    response = requests.head(url, headers=headers())
+def test_todos_endpoint_HEAD_xml(client, save_system_state, setup_todos):
+    response = client.head_todos(headers=headers())
     assert response.status_code == 200
 
     #Assert that expected headers are present
@@ -238,39 +129,32 @@ def test_todos_endpoint_HEAD_xml(save_system_state, setup_todos):
     assert 'Transfer-Encoding' in response.headers
     assert response.headers['Transfer-Encoding'] == 'chunked'
     
-def test_todos_id_endpoint_GET_xml(save_system_state, setup_todos):
-    post_response = requests.post(url, data=todo_1(), headers=headers())
+def test_todos_id_endpoint_GET_xml(client, save_system_state, setup_todos):
+    post_response = client.create_todo(data=todo_1(), headers=headers())
     assert post_response.status_code == 201
 
-    post_response_xml = parse_xml_response(post_response.content)
-    post_id = post_response_xml.find("id").text
+    post_id = parse_xml_response(post_response)[0].id
     
-    response = requests.get(f"{url}/{post_id}", headers=headers())
+    response = client.get_todo(post_id, headers=headers(), stream=True)
     assert response.status_code == 200
 
-    todos = parse_xml_response(response.content)
-    todos_list = todos.findall('todo')
+    todos_list = parse_xml_response(response)
     
-    observed_todo_1 = {
-        "doneStatus": todos_list[0].find("doneStatus").text,
-        "description": todos_list[0].find("description").text,
-        "title": todos_list[0].find("title").text
-    }
+    observed_todo_1 = todos_list[0].without_id()
 
-    expected_todo_1 = {
-        "doneStatus": "false", 
-        "description": "Initial test",
-        "title": "Test 1"
-    }
+    expected_todo_1 = Todo(
+        title="Test 1",
+        done_status=False,
+        description="Initial test"
+    )
 
     assert observed_todo_1 == expected_todo_1
 
-def test_todos_id_endpoint_POST_xml(save_system_state, setup_todos):
-    post_response = requests.post(url, data=todo_1(), headers=headers())
+def test_todos_id_endpoint_POST_xml(client, save_system_state, setup_todos):
+    post_response = client.create_todo(data=todo_1(), headers=headers())
     assert post_response.status_code == 201
 
-    post_response_xml = parse_xml_response(post_response.content)
-    post_id = post_response_xml.find("id").text
+    post_id = parse_xml_response(post_response)[0].id
 
     todo_1_amended= '''
     <todo>
@@ -279,32 +163,27 @@ def test_todos_id_endpoint_POST_xml(save_system_state, setup_todos):
     '''
 
     # Update todo_1 with todo_1_amended
-    response = requests.post(f"{url}/{post_id}", data=todo_1_amended, headers=headers())
+    response = client.amend_todo(post_id, data=todo_1_amended, headers=headers())
     assert response.status_code == 200
 
-    todos = parse_xml_response(response.content)
-    observed_todo_1 = {
-        "doneStatus": todos.find("doneStatus").text,
-        "description": todos.find("description").text,
-        "title": todos.find("title").text
-    }
-    observed_id = todos.find("id").text
+    todo = parse_xml_response(response)[0]
+    observed_todo_1 = todo.without_id()
+    observed_id = todo.id
 
-    expected_todo_1 = {
-        "doneStatus": "true", #Updated 
-        "description": "Initial test",
-        "title": "Test 1"
-    }
+    expected_todo_1 = Todo(
+        title="Test 1",
+        done_status=True, #Updated 
+        description="Initial test"
+    )
 
     assert observed_todo_1 == expected_todo_1 
     assert observed_id == post_id
 
-def test_todos_id_endpoint_PUT_xml(save_system_state, setup_todos):
-    post_response = requests.post(url, data=todo_1(), headers=headers())
+def test_todos_id_endpoint_PUT_xml(client, save_system_state, setup_todos):
+    post_response = client.create_todo(data=todo_1(), headers=headers())
     assert post_response.status_code == 201
 
-    post_response_xml = parse_xml_response(post_response.content)
-    post_id = post_response_xml.find("id").text
+    post_id = parse_xml_response(post_response)[0].id
     
     todo_1_amended= '''
         <todo>
@@ -314,34 +193,29 @@ def test_todos_id_endpoint_PUT_xml(save_system_state, setup_todos):
         '''
     
     #Update todo_1 with todo_1_amended
-    response = requests.put(f"{url}/{post_id}", data=todo_1_amended, headers=headers())
+    response = client.replace_todo(post_id, data=todo_1_amended, headers=headers())
     assert response.status_code == 200
 
-    todos = parse_xml_response(response.content)
-    observed_todo_1 = {
-        "doneStatus": todos.find("doneStatus").text,
-        "description": todos.find("description").text,
-        "title": todos.find("title").text
-    }
-    observed_id = todos.find("id").text
+    todo = parse_xml_response(response)[0]
+    observed_todo_1 = todo.without_id()
+    observed_id = todo.id
 
-    expected_todo_1 = {
-        "doneStatus": "false", 
-        "description": "New description", #Updated 
-        "title": "New title" #Updated 
-    }
+    expected_todo_1 = Todo(
+        title="New title", #Updated 
+        done_status=False,
+        description="New description" #Updated 
+    )
 
     assert observed_todo_1 == expected_todo_1 
     assert observed_id == post_id
 
-def test_todos_id_endpoint_HEAD_xml(save_system_state, setup_todos):
-    post_response = requests.post(url, data=todo_1(), headers=headers())
+def test_todos_id_endpoint_HEAD_xml(client, save_system_state, setup_todos):
+    post_response = client.create_todo(data=todo_1(), headers=headers())
     assert post_response.status_code == 201
 
-    post_response_xml = parse_xml_response(post_response.content)
-    post_id = post_response_xml.find("id").text
+    post_id = parse_xml_response(post_response)[0].id
     
-    response = requests.head(f"{url}/{post_id}", headers=headers())
+    response = client.head_todos(post_id, headers=headers())
 
     #Assert proper headers
     assert response.status_code == 200
@@ -356,58 +230,54 @@ def test_todos_id_endpoint_HEAD_xml(save_system_state, setup_todos):
     assert 'Transfer-Encoding' in response.headers
     assert response.headers['Transfer-Encoding'] == 'chunked'
 
-def test_todos_id_endpoint_DELETE_empty_xml(save_system_state, setup_todos):
-    post_response = requests.post(url, data=todo_1(), headers=headers())
+def test_todos_id_endpoint_DELETE_empty_xml(client, save_system_state, setup_todos):
+    post_response = client.create_todo(data=todo_1(), headers=headers())
     assert post_response.status_code == 201
 
-    post_response_xml = parse_xml_response(post_response.content)
-    post_id = post_response_xml.find("id").text
+    post_id = parse_xml_response(post_response)[0].id
 
-    delete_response = requests.delete(f"{url}/{post_id}", headers=headers())
+    delete_response = client.delete_todo(post_id, headers=headers())
     assert delete_response.status_code == 200
     
-    get_response = requests.get(url, headers=headers())
+    get_response = client.list_todos(headers=headers(), stream=True)
     assert get_response.status_code == 200
 
-    get_response_xml = parse_xml_response(get_response.content)
-    todos = get_response_xml.findall("todo")
+    todos = parse_xml_response(get_response)
 
     #Assert that there are no todos left
     assert len(todos) == 0
 
-def test_todos_id_endpoint_DELETE_not_empty_xml(save_system_state, setup_todos):
-    post_response_1 = requests.post(url, data=todo_1(), headers=headers())
+def test_todos_id_endpoint_DELETE_not_empty_xml(client, save_system_state, setup_todos):
+    post_response_1 = client.create_todo(data=todo_1(), headers=headers())
     assert post_response_1.status_code == 201
 
-    post_response_2 = requests.post(url, data=todo_2(), headers=headers())
+    post_response_2 = client.create_todo(data=todo_2(), headers=headers())
     assert post_response_2.status_code == 201
 
-    post_response_xml = parse_xml_response(post_response_2.content)
-    post_id = post_response_xml.find("id").text
+    post_id = parse_xml_response(post_response_2)[0].id
 
-    delete_response = requests.delete(f"{url}/{post_id}", headers=headers())
+    delete_response = client.delete_todo(post_id, headers=headers())
     assert delete_response.status_code == 200
 
-    get_response = requests.get(url, headers=headers())
+    get_response = client.list_todos(headers=headers(), stream=True)
     assert get_response.status_code == 200
 
-    get_response_xml = parse_xml_response(get_response.content)
-    todos = get_response_xml.findall("todo")
+    todos = parse_xml_response(get_response)
 
     #Assert only one todo remains
     assert len(todos) == 1
 
-def test_todos_endpoint_DELETE_return_code_xml(save_system_state, setup_todos):
+def test_todos_endpoint_DELETE_return_code_xml(client, save_system_state, setup_todos):
      #An unsupported endpoint
-     response = requests.delete(url, headers=headers())
+     response = client.request("DELETE", "/todos", headers=headers())
      assert response.status_code == 405
 
-def test_todos_endpoint_PUT_return_code_xml(save_system_state, setup_todos):
+def test_todos_endpoint_PUT_return_code_xml(client, save_system_state, setup_todos):
      #An unsupported endpoint
-     response = requests.put(url, json=todo_1(), headers=headers())
+     response = client.request("PUT", "/todos", json=todo_1(), headers=headers())
      assert response.status_code == 405
 
-def test_todos_endpoint_POST_malformed_xml(save_system_state, setup_todos):
+def test_todos_endpoint_POST_malformed_xml(client, save_system_state, setup_todos):
     #Deliberately malformed XML
     malformed_xml = """
     <todo>
@@ -416,7 +286,45 @@ def test_todos_endpoint_POST_malformed_xml(save_system_state, setup_todos):
         <description>Malformed XML
     </todo>
     """
-    response = requests.post(url, data=malformed_xml, headers=headers())
+    response = client.create_todo(data=malformed_xml, headers=headers())
     
     #Assert that the malformed xml error is caught
-    assert response.status_code == 400
\ No newline at end of file
+    assert response.status_code == 400
+
+#Show that changes to data in the system are restricted to those which should change based on the API operation
+def test_todos_endpoint_POST_no_side_effects_xml(client, save_initial_state, save_system_state):
+    initial_state = StateSnapshot.capture(client, headers=headers())
+
+    post_response = client.create_todo(data=todo_1(), headers=headers())
+    assert post_response.status_code == 201
+
+    post_id = parse_xml_response(post_response)[0].id
+    changes = initial_state.diff(StateSnapshot.capture(client, headers=headers()))
+
+    #Assert only the posted todo was added and nothing else changed
+    assert changes.added == {post_id}
+    assert not changes.removed and not changes.modified
+    assert changes.unchanged == initial_state.todos.keys()
+
+def test_todos_endpoint_id_PUT_no_side_effects_xml(client, save_initial_state, save_system_state):
+    post_response = client.create_todo(data=todo_1(), headers=headers())
+    assert post_response.status_code == 201
+
+    post_id = parse_xml_response(post_response)[0].id
+    initial_state = StateSnapshot.capture(client, headers=headers())
+
+    todo_1_amended = '''
+        <todo>
+            <description>New description</description>
+            <title>New title</title>
+        </todo>
+        '''
+    put_response = client.replace_todo(post_id, data=todo_1_amended, headers=headers())
+    assert put_response.status_code == 200
+
+    changes = initial_state.diff(StateSnapshot.capture(client, headers=headers()))
+
+    #Assert only the replaced todo was modified
+    assert changes.modified == {post_id}
+    assert not changes.added and not changes.removed
+    assert len(changes.unchanged) == len(initial_state) - 1